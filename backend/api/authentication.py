@@ -0,0 +1,35 @@
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core.db_router import primary
+from core.token_cache import token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену, которая запоминает пользователя
+    токена в кэше процесса и не обращается к базе на каждый запрос.
+    В кэш попадают только активные пользователи. Без общего кэша
+    Django (REDIS_URL) токен каждый раз читается из базы.
+    """
+
+    def authenticate_credentials(self, key):
+        if not token_cache.enabled:
+            with primary():
+                return super().authenticate_credentials(key)
+        model = self.get_model()
+        user = token_cache.get(key)
+        if user is not None:
+            return user, model(key=key, user=user)
+        generation = token_cache.generation(key)
+        try:
+            # Токен читается из основной базы: новый токен может ещё
+            # не дойти до реплики, а удалённый - ещё не удалиться.
+            with primary():
+                token = model.objects.select_related('user').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        token_cache.set(key, token.user, generation)
+        return token.user, token
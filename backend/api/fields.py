@@ -1,17 +1,131 @@
 import base64
+import binascii
+from tempfile import SpooledTemporaryFile
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files import File
+from django.core.validators import get_available_image_extensions
+from PIL import Image
 from rest_framework import serializers
 
+from core.image_derivatives import DERIVATIVE_FORMATS
+
+BASE64_PREFIX = 'data:image/'
+BASE64_SEPARATOR = ';base64,'
+# Заголовок data URI короткий, дальше него разделитель не ищется.
+BASE64_HEADER_MAX_LENGTH = 64
+# Размер куска данных, декодируемого за раз, в символах.
+BASE64_CHUNK_SIZE = 256 * 1024
+
 
 class Base64ImageField(serializers.ImageField):
     """
     Переопределение функции для работы с изображениями в Base64.
+    Данные декодируются по частям во временный файл, который
+    держится в памяти до IMAGE_UPLOAD_SPOOL_BYTES и дальше
+    переносится на диск. Тип из заголовка должен быть расширением
+    изображения Pillow, пробелы и переносы строк в данных допускаются.
+    Размер проверяется при декодировании, количество пикселей -
+    по заголовку, до распаковки изображения.
     """
+    default_error_messages = {
+        'invalid_base64': 'Ожидается изображение в формате '
+                          'data:image/<тип>;base64,<данные>.',
+        'invalid_extension': 'Недопустимый тип изображения «{extension}».',
+        'too_large': 'Размер изображения не должен превышать '
+                     '{max_bytes} байт.',
+        'too_many_pixels': 'Изображение не должно содержать больше '
+                           '{max_pixels} пикселей.',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            file_formatting, image_b64 = data.split(';base64,')
-            ext = file_formatting.split('/')[-1]
-            data = ContentFile(base64.b64decode(image_b64), name='temp.' + ext)
+            return serializers.FileField.to_internal_value(
+                self, self.decode(data))
 
         return super().to_internal_value(data)
+
+    def decode(self, data):
+        separator = data.find(BASE64_SEPARATOR, 0, BASE64_HEADER_MAX_LENGTH)
+        if separator == -1:
+            self.fail('invalid_base64')
+        ext = data[len(BASE64_PREFIX):separator].lower()
+        if ext not in get_available_image_extensions():
+            self.fail('invalid_extension', extension=ext)
+        start = separator + len(BASE64_SEPARATOR)
+        max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES
+
+        file = SpooledTemporaryFile(
+            max_size=settings.IMAGE_UPLOAD_SPOOL_BYTES)
+        # Символы после удаления пробелов, которые не вошли в кратную 4
+        # часть куска, декодируются вместе со следующим куском.
+        rest = ''
+        try:
+            for position in range(start, len(data), BASE64_CHUNK_SIZE):
+                chunk = rest + ''.join(
+                    data[position:position + BASE64_CHUNK_SIZE].split())
+                usable = len(chunk) - len(chunk) % 4
+                file.write(base64.b64decode(chunk[:usable], validate=True))
+                rest = chunk[usable:]
+                if file.tell() > max_bytes:
+                    file.close()
+                    self.fail('too_large', max_bytes=max_bytes)
+        except binascii.Error:
+            file.close()
+            self.fail('invalid_base64')
+        if rest:
+            file.close()
+            self.fail('invalid_base64')
+        file.seek(0)
+        self.verify_image(file)
+        return File(file, name='temp.' + ext)
+
+    def verify_image(self, file):
+        """
+        Открывает изображение без распаковки: Pillow читает только
+        заголовок, по нему проверяется размер в пикселях.
+        """
+        max_pixels = settings.IMAGE_UPLOAD_MAX_PIXELS
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+                too_many_pixels = width * height > max_pixels
+                if not too_many_pixels:
+                    image.verify()
+        except Image.DecompressionBombError:
+            too_many_pixels = True
+        except Exception:
+            file.close()
+            self.fail('invalid_image')
+        if too_many_pixels:
+            file.close()
+            self.fail('too_many_pixels', max_pixels=max_pixels)
+        file.seek(0)
+
+
+class ImageDerivativeField(serializers.Field):
+    """
+    Ссылки на уменьшенную копию изображения рецепта в каждом формате:
+    {"webp": url, "jpeg": url}. Пока копии нет, ссылки ведут на оригинал.
+    """
+
+    def __init__(self, size, **kwargs):
+        self.size = size
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        derivatives = recipe.image_derivatives or {}
+        paths = {}
+        if derivatives.get('source') == recipe.image.name:
+            paths = derivatives.get(self.size, {})
+        request = self.context.get('request')
+        urls = {}
+        for fmt in DERIVATIVE_FORMATS:
+            url = (recipe.image.storage.url(paths[fmt]) if fmt in paths
+                   else recipe.image.url)
+            urls[fmt] = request.build_absolute_uri(url) if request else url
+        return urls
@@ -1,12 +1,10 @@
-from rest_framework.filters import SearchFilter
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Exists, F, OuterRef, Q
 from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
 
-from recipes.models import Recipe, Tag
-
-
-class IngredientSearch(SearchFilter):
-    """ Поиск по ингредиентам. """
-    search_param = 'name'
+from recipes.lookups import TrigramWordSimilarity
+from recipes.models import RECIPE_SEARCH_CONFIG, Recipe, RecipeTag, Tag
 
 
 class RecipeFilter(filters.FilterSet):
@@ -19,8 +17,10 @@ class RecipeFilter(filters.FilterSet):
         field_name='tags__slug',
         queryset=Tag.objects.all(),
         to_field_name='slug',
-        label='Tags'
+        label='Tags',
+        method='get_tags'
     )
+    search = filters.CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
@@ -28,7 +28,8 @@ class RecipeFilter(filters.FilterSet):
             'author',
             'tags',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'search',
         ]
 
     def get_favorite(self, queryset, value, _):
@@ -40,3 +41,44 @@ class RecipeFilter(filters.FilterSet):
         if value:
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
+
+    def get_tags(self, queryset, name, value):
+        """
+        Рецепты хотя бы с одним из тэгов. Подзапрос EXISTS вместо JOIN
+        не размножает строки, поэтому не нужен DISTINCT и лента
+        отдаётся в порядке индекса по дате публикации.
+        """
+        if not value:
+            return queryset
+        return queryset.filter(Exists(RecipeTag.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value)))
+
+    def get_search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по названию и описанию рецепта
+        с нечётким (триграммным) совпадением по названию.
+        Результаты отсортированы по релевантности.
+        """
+        query = SearchQuery(value, config=RECIPE_SEARCH_CONFIG,
+                            search_type='websearch')
+        return queryset.filter(
+            Q(search_vector=query) | Q(name__trigram_word_similar=value)
+        ).annotate(
+            search_rank=SearchRank(F('search_vector'), query),
+            name_similarity=TrigramWordSimilarity(value, 'name'),
+        ).order_by('-search_rank', '-name_similarity', '-pub_date', '-id')
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """
+    Сортировка рецептов по счётчикам популярности:
+    ?ordering=-favorites_count. Равные значения упорядочиваются
+    по убыванию id. Без параметра порядок запроса (в том числе
+    по релевантности поиска) не меняется.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering:
+            return [*ordering, '-id']
+        return list(queryset.query.order_by or queryset.model._meta.ordering)
@@ -1,6 +1,50 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class LimitCursorPagination(CursorPagination):
+    """
+    Keyset-пагинация по стабильному индексированному порядку:
+    без COUNT(*) и OFFSET, стоимость страницы не зависит от её номера.
+    Для рецептов порядок задаёт RecipeOrderingFilter
+    (по умолчанию - по дате публикации).
+    """
+    page_size_query_param = 'limit'
+    page_size = 6
+    ordering = '-id'
 
 
 class PageNumberLimitPagination(PageNumberPagination):
+    """
+    Постраничная пагинация с параметром limit.
+    Если в запросе передан cursor (в том числе пустой - первая страница),
+    используется LimitCursorPagination. Курсор не сочетается с поиском
+    и сортировкой по популярности: релевантность и счётчики не задают
+    устойчивую позицию, и страницы пропускали бы или повторяли рецепты.
+    """
     page_size_query_param = 'limit'
     page_size = 6
+    cursor_query_param = 'cursor'
+    cursor_pagination_class = LimitCursorPagination
+    cursor_conflicting_params = ('search', 'ordering')
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            conflicting = [
+                param for param in self.cursor_conflicting_params
+                if param in request.query_params]
+            if conflicting:
+                raise ValidationError({self.cursor_query_param: (
+                    'Курсорная пагинация несовместима с параметрами: '
+                    f'{", ".join(conflicting)}')})
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
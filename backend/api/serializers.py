@@ -1,15 +1,34 @@
 from django.core.validators import RegexValidator
+from django.db.models import Manager
 from django.db.transaction import atomic
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
 
-from .fields import Base64ImageField
+from .fields import Base64ImageField, ImageDerivativeField
+from .utils import get_subscription_resolver
 from recipes.models import (Tag, Recipe, RecipeIngredient,
-                            Ingredient, RecipeTag, Favorite, ShoppingCart)
+                            Ingredient, RecipeTag, Favorite, ShoppingCart,
+                            ShoppingListItem)
 from users.models import CustomUser, Subscription
 
 
+class SubscriptionPrefetchListSerializer(serializers.ListSerializer):
+    """
+    Список, который до сериализации элементов передаёт id всех авторов
+    в SubscriptionResolver запроса, чтобы флаги is_subscribed
+    определялись одним запросом на весь ответ.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, Manager) else data
+        request = self.context.get('request')
+        if request:
+            get_subscription_resolver(request).add(
+                self.child.get_author_id(item) for item in iterable)
+        return super().to_representation(iterable)
+
+
 class UserSerializer(serializers.ModelSerializer):
     """
     Сериализатор для работы с пользователем.
@@ -37,6 +56,7 @@ class UserSerializer(serializers.ModelSerializer):
             'is_subscribed',
         ]
         extra_kwargs = {'password': {'write_only': True}}
+        list_serializer_class = SubscriptionPrefetchListSerializer
 
     def create(self, validated_data):
         """ Создание нового пользователя. """
@@ -50,20 +70,20 @@ class UserSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
+    def get_author_id(self, obj):
+        return obj.id
+
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
-        if not request or request.user.is_anonymous:
+        if not request:
             return False
-        return Subscription.objects.filter(
-            user=request.user, author=obj
-        ).exists()
+        return get_subscription_resolver(request).is_subscribed(obj.id)
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
     """
     Сериализатор для работы с подписками/отписками.
     """
-    recipes_count = SerializerMethodField()
     recipes = SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
@@ -83,16 +103,19 @@ class SubscribeSerializer(serializers.ModelSerializer):
             'email',
             'username',
             'first_name',
-            'last_name'
+            'last_name',
+            'recipes_count'
         ]
+        list_serializer_class = SubscriptionPrefetchListSerializer
+
+    def get_author_id(self, obj):
+        return obj.id
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
-        if not request or request.user.is_anonymous:
+        if not request:
             return False
-        return Subscription.objects.filter(
-            user=request.user, author=obj
-        ).exists()
+        return get_subscription_resolver(request).is_subscribed(obj.id)
 
     def validate(self, data):
         author = self.instance
@@ -110,17 +133,18 @@ class SubscribeSerializer(serializers.ModelSerializer):
         return data
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if limit:
-            recipes = recipes[:int(limit)]
-        serializer = RecipeSerializer(recipes, many=True, read_only=True)
+        if hasattr(obj, 'recipes_preview'):
+            recipes = obj.recipes_preview
+        else:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            recipes = obj.recipes.order_by('-pub_date', '-id')
+            if limit:
+                recipes = recipes[:int(limit)]
+        serializer = ShortRecipeSerializer(
+            recipes, many=True, read_only=True, context=self.context)
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class TagSerializer(serializers.ModelSerializer):
     """
@@ -175,7 +199,11 @@ class RecipeSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     image = Base64ImageField(required=True, allow_null=False)
-    ingredients = RecipeIngredientSerializer(many=True, read_only=True)
+    image_thumb = ImageDerivativeField('thumb')
+    image_card = ImageDerivativeField('card')
+    image_full = ImageDerivativeField('full')
+    ingredients = RecipeIngredientSerializer(
+        many=True, read_only=True, source='recipeingredient_set')
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
 
@@ -191,10 +219,19 @@ class RecipeSerializer(serializers.ModelSerializer):
             'name',
             'text',
             'image',
+            'image_thumb',
+            'image_card',
+            'image_full',
             'cooking_time'
         ]
+        list_serializer_class = SubscriptionPrefetchListSerializer
+
+    def get_author_id(self, obj):
+        return obj.author_id
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
@@ -203,6 +240,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
@@ -211,6 +250,24 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
 
+class ShortRecipeSerializer(serializers.ModelSerializer):
+    """
+    Сокращённое представление рецепта для списка подписок.
+    """
+    image_thumb = ImageDerivativeField('thumb')
+
+    class Meta:
+        model = Recipe
+        fields = [
+            'id',
+            'name',
+            'image',
+            'image_thumb',
+            'cooking_time',
+        ]
+        read_only_fields = fields
+
+
 class AddIngredientRecipeSerializer(serializers.ModelSerializer):
     """
     Сериализатор, отвечающий за добавление ингредиента в рецепт.
@@ -249,25 +306,27 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             'cooking_time'
         ]
 
-    def validate(self, data):
-        ingredient_list = []
-        for ingredient in data.get('ingredients'):
-            if ingredient.get('amount') < 1:
-                raise serializers.ValidationError({
-                    'amount': 'Ингредиентов должно быть больше одного!'
-                })
-            if ingredient.get('id') in ingredient_list:
-                raise serializers.ValidationError({
-                    'ingredient': 'Ингредиенты не могут повторяться!'
-                })
-            ingredient_list.append(ingredient.get('id'))
-        return data
+    def validate_ingredients(self, ingredients):
+        """ Все id ингредиентов проверяются одним запросом. """
+        ingredient_ids = [ingredient['id'] for ingredient in ingredients]
+        if len(set(ingredient_ids)) != len(ingredient_ids):
+            raise serializers.ValidationError(
+                'Ингредиенты не могут повторяться!')
+        existing = set(Ingredient.objects.filter(
+            id__in=ingredient_ids).values_list('id', flat=True))
+        missing = [
+            str(ingredient_id) for ingredient_id in ingredient_ids
+            if ingredient_id not in existing]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {", ".join(missing)}')
+        return ingredients
 
     def create_ingredients(self, ingredients, recipe):
         ingredient_list = []
         for ingredient in ingredients:
             ingredient_list.append(RecipeIngredient(
-                recipe=recipe, ingredient=ingredient,
+                recipe=recipe, ingredient_id=ingredient.get('id'),
                 amount=ingredient.get('amount')))
         RecipeIngredient.objects.bulk_create(ingredient_list)
 
@@ -277,6 +336,65 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             tags_list.append(RecipeTag(recipe=recipe, tag=tag))
         RecipeTag.objects.bulk_create(tags_list)
 
+    def update_ingredients(self, ingredients, recipe):
+        """
+        Изменяет только отличающиеся ингредиенты рецепта
+        и переносит разницу количеств в списки покупок.
+        """
+        current = {
+            ingredient_id: (pk, amount)
+            for pk, ingredient_id, amount
+            in RecipeIngredient.objects.filter(recipe=recipe).values_list(
+                'id', 'ingredient_id', 'amount')
+        }
+        wanted = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = current.keys() - wanted.keys()
+        changed = [
+            RecipeIngredient(id=current[ingredient_id][0], amount=amount)
+            for ingredient_id, amount in wanted.items()
+            if ingredient_id in current
+            and current[ingredient_id][1] != amount
+        ]
+        added = [
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amount)
+            for ingredient_id, amount in wanted.items()
+            if ingredient_id not in current
+        ]
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        deltas = {
+            ingredient_id: -amount
+            for ingredient_id, (_, amount) in current.items()
+        }
+        for ingredient_id, amount in wanted.items():
+            deltas[ingredient_id] = deltas.get(ingredient_id, 0) + amount
+        ShoppingListItem.objects.apply_ingredient_deltas(recipe.id, {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items() if delta
+        })
+
+    def update_tags(self, tags, recipe):
+        """ Удаляет снятые и добавляет новые тэги рецепта. """
+        current = set(RecipeTag.objects.filter(
+            recipe=recipe).values_list('tag_id', flat=True))
+        wanted = {tag.id for tag in tags}
+        if current - wanted:
+            RecipeTag.objects.filter(
+                recipe=recipe, tag_id__in=current - wanted).delete()
+        if wanted - current:
+            RecipeTag.objects.bulk_create(
+                RecipeTag(recipe=recipe, tag_id=tag_id)
+                for tag_id in wanted - current)
+
     @atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
@@ -289,12 +407,13 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
 
     @atomic
     def update(self, instance, validated_data):
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        ingredients = validated_data.pop('ingredients')
-        self.create_ingredients(ingredients, instance)
-        RecipeTag.objects.filter(recipe=instance).delete()
-        tags = validated_data.pop('tags')
-        self.create_tags(tags, instance)
+        if 'ingredients' in validated_data:
+            self.update_ingredients(
+                validated_data.pop('ingredients'), instance)
+        if 'tags' in validated_data:
+            self.update_tags(validated_data.pop('tags'), instance)
+        # Сохранение рецепта идёт последним: сигнал post_save
+        # повышает версию уже после изменения ингредиентов и тэгов.
         super().update(instance, validated_data)
         return instance
 
@@ -308,6 +427,7 @@ class FavoriteSerializer(serializers.ModelSerializer):
     """
     Сериализатор, обрабатывающий добавление рецепта в избранное.
     """
+    image_thumb = ImageDerivativeField('thumb')
 
     class Meta:
         model = Recipe
@@ -315,6 +435,7 @@ class FavoriteSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_thumb',
             'cooking_time',
         ]
 
@@ -339,6 +460,7 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
     """
     Сериализатор, обрабатывающий добавление рецепта в корзину для покупок.
     """
+    image_thumb = ImageDerivativeField('thumb')
 
     class Meta:
         model = Recipe
@@ -346,6 +468,7 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_thumb',
             'cooking_time',
         ]
 
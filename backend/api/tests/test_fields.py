@@ -0,0 +1,64 @@
+import base64
+import io
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.fields import Base64ImageField
+
+
+def png_base64(size=(4, 4)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class Base64ImageFieldTests(SimpleTestCase):
+    """ Разбор изображений в формате data URI. """
+
+    def setUp(self):
+        self.field = Base64ImageField()
+
+    def assertRejected(self, data, code):
+        with self.assertRaises(ValidationError) as context:
+            self.field.to_internal_value(data)
+        self.assertEqual(context.exception.detail[0].code, code)
+
+    def test_image_is_decoded(self):
+        file = self.field.to_internal_value(
+            f'data:image/png;base64,{png_base64()}')
+        self.assertEqual(file.name, 'temp.png')
+        with Image.open(file) as image:
+            self.assertEqual(image.size, (4, 4))
+
+    def test_line_breaks_in_data_are_allowed(self):
+        data = png_base64()
+        wrapped = '\n'.join(data[i:i + 7] for i in range(0, len(data), 7))
+        file = self.field.to_internal_value(
+            f'data:image/png;base64,{wrapped}\r\n')
+        with Image.open(file) as image:
+            self.assertEqual(image.size, (4, 4))
+
+    def test_non_image_extension_is_rejected(self):
+        for ext in ('html', 'svg+xml', 'php'):
+            with self.subTest(ext=ext):
+                self.assertRejected(
+                    f'data:image/{ext};base64,{png_base64()}',
+                    'invalid_extension')
+
+    def test_malformed_base64_is_rejected(self):
+        self.assertRejected('data:image/png;base64,abc', 'invalid_base64')
+        self.assertRejected('data:image/png;base64,ab!d', 'invalid_base64')
+        self.assertRejected('data:image/png,abcd', 'invalid_base64')
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=64)
+    def test_large_image_is_rejected(self):
+        self.assertRejected(
+            f'data:image/png;base64,{png_base64((64, 64))}', 'too_large')
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100)
+    def test_image_with_many_pixels_is_rejected(self):
+        self.assertRejected(
+            f'data:image/png;base64,{png_base64((20, 20))}',
+            'too_many_pixels')
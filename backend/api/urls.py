@@ -3,7 +3,7 @@ from djoser.views import TokenCreateView, TokenDestroyView
 from rest_framework.routers import DefaultRouter
 
 from .views import (CustomUserViewSet, TagViewSet,
-                    RecipeViewSet, IngredientViewSet)
+                    RecipeViewSet, IngredientViewSet, MetricsView)
 
 router = DefaultRouter()
 router.register('users', CustomUserViewSet, basename='users')
@@ -20,4 +20,5 @@ auth_patterns = [
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/token/', include(auth_patterns)),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
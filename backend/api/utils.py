@@ -1,17 +1,26 @@
+from django.db.transaction import atomic
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework import status
 from rest_framework.response import Response
 
+from core.document_cache import document_key
+from recipes.models import Recipe
+from users.models import Subscription
 
-def instance_create_connection(request, instance, model_serializer):
+
+@atomic
+def instance_create_connection(request, model, instance, model_serializer):
     """
     Функция, отвечающая за добавление рецепта в избранное/список покупок.
     """
     serializer = model_serializer(
+        instance,
         data={'user': request.user.id, 'recipe': instance.id, },
         context={'request': request}
     )
     serializer.is_valid(raise_exception=True)
-    serializer.save()
+    model.objects.create(user=request.user, recipe=instance)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
@@ -21,3 +30,104 @@ def instance_delete_connection(request, model, instance):
     """
     model.objects.filter(user=request.user, recipe=instance).delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SubscriptionResolver:
+    """
+    Определяет флаги is_subscribed для всех авторов, выводимых в ответе,
+    одним IN-запросом. Сериализаторы списков заранее сообщают id авторов,
+    недостающие флаги догружаются тем же запросом при первом обращении.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._pending = set()
+        self._resolved = {}
+
+    def prime(self, flags):
+        """ Флаги, уже известные из аннотаций: {author_id: bool}. """
+        self._resolved.update(flags)
+        self._pending.difference_update(flags)
+
+    def add(self, author_ids):
+        self._pending.update(
+            author_id for author_id in author_ids
+            if author_id is not None and author_id not in self._resolved)
+
+    def is_subscribed(self, author_id):
+        if self.user.is_anonymous:
+            return False
+        if author_id not in self._resolved:
+            self._pending.add(author_id)
+            self._resolve()
+        return self._resolved[author_id]
+
+    def _resolve(self):
+        author_ids, self._pending = self._pending, set()
+        subscribed = set(Subscription.objects.filter(
+            user=self.user, author_id__in=author_ids
+        ).values_list('author_id', flat=True))
+        for author_id in author_ids:
+            self._resolved[author_id] = author_id in subscribed
+
+
+def get_subscription_resolver(request):
+    """
+    Возвращает SubscriptionResolver, общий для всех сериализаторов запроса.
+    """
+    resolver = getattr(request, '_subscription_resolver', None)
+    if resolver is None:
+        resolver = SubscriptionResolver(request.user)
+        request._subscription_resolver = resolver
+    return resolver
+
+
+def attach_recipe_previews(authors, limit=None):
+    """
+    Проставляет авторам recipes_preview — их последние рецепты
+    (не более limit на автора), загруженные одним запросом.
+    """
+    previews = {author.id: [] for author in authors}
+    for recipe in Recipe.objects.latest_for_authors(previews, limit):
+        previews[recipe.author_id].append(recipe)
+    for author in authors:
+        author.recipes_preview = previews[author.id]
+    return authors
+
+
+def recipes_validators(request, recipes, envelope=None):
+    """
+    ETag и Last-Modified ответа с рецептами, аннотированными
+    with_user_flags. ETag учитывает версии рецептов, флаги текущего
+    пользователя, формат ответа и данные пагинации (envelope).
+    """
+    etag = quote_etag(document_key(request.accepted_renderer.format, [
+        envelope,
+        [(recipe.id, recipe.version, recipe.is_favorited,
+          recipe.is_in_shopping_cart, recipe.author_id,
+          recipe.is_author_subscribed) for recipe in recipes],
+    ]))
+    last_modified = max(
+        (recipe.updated_at for recipe in recipes), default=None)
+    return etag, last_modified
+
+
+def set_validators(response, etag, last_modified):
+    """ Проставляет ответу ETag, Last-Modified и Cache-Control. """
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def not_modified_response(request, etag, last_modified):
+    """
+    Ответ 304, если у клиента актуальная версия, иначе None.
+    Сравнение идёт только по ETag: избранное и корзина
+    не меняют дату изменения рецепта.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
@@ -1,28 +1,48 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import F
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import (IsAuthenticatedOrReadOnly,
+from rest_framework.permissions import (IsAdminUser,
+                                        IsAuthenticatedOrReadOnly,
                                         IsAuthenticated)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
 
-from core.pdf_generation import generate_pdf
+from core.db_pool import pools_stats
+from core.db_router import primary
+from core.document_cache import document_key, shopping_list_cache
+from core.ingredient_index import ingredient_index
+from core.pdf_generation import iter_pdf_chunks
+from core.pdf_pool import pdf_pool
+from core.reference_cache import ingredients_cache, tags_cache
+from core.response_cache import recipes_response_cache
+from core.shopping_list_export import EXPORTERS
+from core.token_cache import token_cache
 from recipes.models import (Tag, Recipe, Ingredient, Favorite,
-                            ShoppingCart, RecipeIngredient)
+                            ShoppingCart, ShoppingListItem)
 from users.models import CustomUser, Subscription
-from .filters import IngredientSearch, RecipeFilter
+from .filters import RecipeFilter, RecipeOrderingFilter
 from .paginations import PageNumberLimitPagination
 from .permissions import (IsAuthenticatedOrReadOnlyForProfile,
                           AuthorOrReadOnlyForRecipes)
+from .renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
 from .serializers import (UserSerializer, TagSerializer,
                           RecipeSerializer,
                           IngredientSerializer, CreateRecipeSerializer,
                           SubscribeSerializer, FavoriteSerializer,
                           ShoppingCartSerializer)
-from .utils import instance_create_connection, instance_delete_connection
+from .utils import (attach_recipe_previews, get_subscription_resolver,
+                    instance_create_connection, instance_delete_connection,
+                    not_modified_response, recipes_validators,
+                    set_validators)
+
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
 
 
 class CustomUserViewSet(UserViewSet):
@@ -68,8 +88,11 @@ class CustomUserViewSet(UserViewSet):
     def subscriptions(self, request):
         """ Получение списка подписок пользователя. """
         user = request.user
-        queryset = CustomUser.objects.filter(following__user=user)
+        queryset = CustomUser.objects.filter(
+            following__user=user).order_by('id')
         pagination = self.paginate_queryset(queryset)
+        limit = request.query_params.get('recipes_limit')
+        attach_recipe_previews(pagination, int(limit) if limit else None)
         serializer = SubscribeSerializer(pagination,
                                          many=True,
                                          context={'request': request})
@@ -84,6 +107,11 @@ class TagViewSet(viewsets.ModelViewSet):
     serializer_class = TagSerializer
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        """ Список тэгов отдаётся из кэша готовых ответов. """
+        return tags_cache.response(request, lambda: self.get_serializer(
+            self.get_queryset(), many=True).data)
+
 
 class IngredientViewSet(viewsets.ModelViewSet):
     """ ViewSet для ингредиентов."""
@@ -92,8 +120,21 @@ class IngredientViewSet(viewsets.ModelViewSet):
     http_method_names = ['get']
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (IngredientSearch,)
-    search_fields = ('^name',)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Поиск для автодополнения: сначала совпадения по началу названия,
+        затем по вхождению. Отвечает из индекса в памяти, без запроса к БД.
+        Полный список отдаётся из кэша готовых ответов.
+        """
+        name = request.query_params.get('name')
+        if name is None:
+            return ingredients_cache.response(
+                request, lambda: self.get_serializer(
+                    self.get_queryset(), many=True).data)
+        limit = request.query_params.get('limit')
+        return Response(ingredient_index.search(
+            name, int(limit) if limit and limit.isdigit() else None))
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -101,10 +142,89 @@ class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [AuthorOrReadOnlyForRecipes, ]
     pagination_class = PageNumberLimitPagination
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ['favorites_count', 'in_carts_count']
     http_method_names = ['get', 'post', 'patch', 'delete']
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return Recipe.objects.with_user_flags(self.request.user)
+        return Recipe.objects.all()
+
+    def get_recipes_response(self, recipes, many=True, paginated=False):
+        """
+        Ответ 304, если версии рецептов и флаги пользователя
+        не изменились, иначе сериализованные рецепты.
+        Тэги и ингредиенты загружаются только во втором случае.
+        """
+        envelope = None
+        if paginated:
+            envelope = self.get_paginated_response([]).data
+        etag, last_modified = recipes_validators(
+            self.request, recipes, envelope)
+        not_modified = not_modified_response(
+            self.request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        Recipe.objects.prefetch_details(recipes)
+        get_subscription_resolver(self.request).prime({
+            recipe.author_id: recipe.is_author_subscribed
+            for recipe in recipes})
+        if not many:
+            response = Response(self.get_serializer(recipes[0]).data)
+        elif paginated:
+            response = self.get_paginated_response(
+                self.get_serializer(recipes, many=True).data)
+        else:
+            response = Response(self.get_serializer(recipes, many=True).data)
+        return set_validators(response, etag, last_modified)
+
+    def get_cached_response(self, build):
+        """
+        Анонимные ответы берутся из кэша готовых ответов, ключ
+        которого включает параметры запроса и поколения данных.
+        Ответы с флагами пользователя строятся заново.
+        """
+        if not self.request.user.is_anonymous:
+            return build()
+        generations = ['recipes']
+        if 'ordering' in self.request.query_params:
+            generations.append('popularity')
+        key = recipes_response_cache.key(self.request, generations)
+        cached = recipes_response_cache.get(key)
+        if cached is None:
+            # Ответ строится по основной базе: сразу после смены
+            # поколения реплика может ещё отдавать старые данные.
+            with primary():
+                response = build()
+            if response.status_code == status.HTTP_200_OK:
+                recipes_response_cache.set(key, (
+                    response.data,
+                    {header: response[header] for header in CACHED_HEADERS
+                     if response.has_header(header)}))
+            return response
+        data, headers = cached
+        response = get_conditional_response(
+            self.request, etag=headers['ETag']) or Response(data)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    def list(self, request, *args, **kwargs):
+        def build():
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
+            if page is None:
+                return self.get_recipes_response(list(queryset))
+            return self.get_recipes_response(page, paginated=True)
+
+        return self.get_cached_response(build)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(lambda: self.get_recipes_response(
+            [self.get_object()], many=False))
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeSerializer
@@ -121,6 +241,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         if request.method == 'POST':
             return instance_create_connection(request,
+                                              Favorite,
                                               favorite_recipe,
                                               FavoriteSerializer)
         return instance_delete_connection(
@@ -138,6 +259,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         if request.method == 'POST':
             return instance_create_connection(request,
+                                              ShoppingCart,
                                               shopping_recipe,
                                               ShoppingCartSerializer)
         return instance_delete_connection(
@@ -146,19 +268,65 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         methods=['get'],
         detail=False,
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[PDFRenderer, PlainTextRenderer,
+                          CSVRenderer, JSONRenderer]
     )
     def download_shopping_cart(self, request):
-        """ Метод для скачивания pdf-файла с ингредиентами."""
-        ingredients_list = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=request.user
+        """
+        Метод для скачивания списка покупок.
+        Формат выбирается параметром ?format=pdf|txt|csv|json
+        или заголовком Accept, по умолчанию - pdf.
+        """
+        ingredients_list = ShoppingListItem.objects.filter(
+            user=request.user
         ).values('ingredient__name', 'ingredient__measurement_unit'
-                 ).annotate(total_amount=Sum('amount'))
-        result = generate_pdf(ingredients_list)
-        response = HttpResponse(
-            result,
+                 ).annotate(total_amount=F('amount')
+                            ).order_by('ingredient__name')
+        renderer = request.accepted_renderer
+        if renderer.format != 'pdf':
+            response = StreamingHttpResponse(
+                EXPORTERS[renderer.format](ingredients_list.iterator()),
+                content_type=f'{renderer.media_type}; charset=utf-8')
+            response['Content-Disposition'] = (
+                f'attachment; filename="shopping_list.{renderer.format}"')
+            return response
+
+        ingredients_list = list(ingredients_list)
+        key = document_key('pdf', ingredients_list)
+        etag = quote_etag(key)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        document = shopping_list_cache.get(key)
+        if document is None:
+            document = pdf_pool.render(ingredients_list)
+            shopping_list_cache.set(key, document)
+        response = StreamingHttpResponse(
+            iter_pdf_chunks(document),
             content_type='application/pdf')
+        response['Content-Length'] = len(document)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
         response[
             'Content-Disposition'] = 'attachment; filename="shopping_list.pdf"'
 
         return response
+
+
+class MetricsView(APIView):
+    """
+    Состояние процесса веб-сервера для администраторов:
+    загрузка пула построения PDF и время построения документов,
+    попадания в кэш токенов аутентификации, соединения с базой данных.
+    Значения относятся к процессу, обработавшему запрос.
+    """
+    permission_classes = [IsAdminUser, ]
+
+    def get(self, request):
+        return Response({
+            'pdf_render': pdf_pool.stats(),
+            'token_cache': token_cache.stats(),
+            'db_pool': pools_stats(),
+        })
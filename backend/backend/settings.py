@@ -19,6 +19,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -30,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.request_timing.RequestTimingMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -103,12 +106,80 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 AUTH_USER_MODEL = 'users.CustomUser'
 
+# Максимальное время жизни индекса автодополнения ингредиентов, секунды
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+
+# Максимальное время жизни кэша ответов справочников (тэги, ингредиенты)
+REFERENCE_CACHE_TTL = int(os.getenv('REFERENCE_CACHE_TTL', 300))
+
+# Кэш Django, общий для процессов (Redis, REDIS_URL): поколения данных
+# кэша ответов и токенов. Без REDIS_URL кэш живёт в памяти процесса
+# и годится только для одного процесса (runserver, GUNICORN_WORKERS=1).
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'SOCKET_CONNECT_TIMEOUT': 1,
+                'SOCKET_TIMEOUT': 1,
+            },
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
+# Кэш готовых ответов со списком рецептов для анонимных пользователей:
+# алиас из CACHES и время жизни ответа, секунды
+RESPONSE_CACHE_ALIAS = os.getenv('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 60))
+
+# Кэш токенов аутентификации в памяти процесса: время жизни записи,
+# секунды, и наибольшее число записей
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 60))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+
+# Предельный суммарный размер кэша готовых списков покупок, байты
+SHOPPING_LIST_CACHE_MAX_BYTES = int(
+    os.getenv('SHOPPING_LIST_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+# Ограничения изображений рецептов, загружаемых в Base64
+IMAGE_UPLOAD_MAX_BYTES = int(
+    os.getenv('IMAGE_UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+IMAGE_UPLOAD_MAX_PIXELS = int(
+    os.getenv('IMAGE_UPLOAD_MAX_PIXELS', 40_000_000))
+# Размер, до которого декодированное изображение держится в памяти, байты
+IMAGE_UPLOAD_SPOOL_BYTES = int(
+    os.getenv('IMAGE_UPLOAD_SPOOL_BYTES', 1024 * 1024))
+
+# Пул процессов для построения PDF списка покупок: число процессов,
+# сколько документов может ждать в очереди сверх них, сколько секунд
+# ждать документ и через сколько секунд клиенту повторить запрос (503)
+PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', 2))
+PDF_RENDER_QUEUE_LIMIT = int(os.getenv('PDF_RENDER_QUEUE_LIMIT', 4))
+PDF_RENDER_TIMEOUT = float(os.getenv('PDF_RENDER_TIMEOUT', 10))
+PDF_RENDER_RETRY_AFTER = int(os.getenv('PDF_RENDER_RETRY_AFTER', 5))
+
+# Замеры запросов к БД и заголовок Server-Timing (включать по необходимости)
+REQUEST_TIMING_ENABLED = os.getenv(
+    'REQUEST_TIMING_ENABLED', 'false').lower() == 'true'
+# Бюджеты запроса, при превышении которых в лог пишется предупреждение
+REQUEST_TIMING_QUERY_BUDGET = int(
+    os.getenv('REQUEST_TIMING_QUERY_BUDGET', 20))
+REQUEST_TIMING_LATENCY_BUDGET_MS = int(
+    os.getenv('REQUEST_TIMING_LATENCY_BUDGET_MS', 500))
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
 }
 
@@ -128,16 +199,52 @@ DJOSER = {
 }
 
 # POSTGRESQL
+# Соединения берутся из пула процесса (core.db_pool) и возвращаются
+# в него в конце каждого запроса, поэтому CONN_MAX_AGE = 0.
+# DB_POOLER_MODE=transaction - база за пулером в режиме транзакций
+# (PgBouncer): отключаются серверные курсоры.
+DB_POOLER_MODE = os.getenv('DB_POOLER_MODE', 'session')
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db_backends.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': 0,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOLER_MODE == 'transaction',
+        'POOL': {
+            'SIZE': int(os.getenv('DB_POOL_SIZE', 4)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'MAX_AGE': int(os.getenv('DB_POOL_MAX_AGE', 600)),
+            'CHECK_IDLE': int(os.getenv('DB_POOL_CHECK_IDLE', 10)),
+        },
     }
 }
 
+# Реплики для чтения: DB_REPLICAS=хост[:порт],... и имя базы данных
+# на репликах DB_REPLICA_NAME (по умолчанию как у основной базы).
+# Каждая реплика получает алиас replica_N.
+DATABASE_REPLICAS = []
+for number, address in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    replica_host, _, replica_port = address.strip().partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'POOL': dict(DATABASES['default']['POOL']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+
+# Сколько секунд клиент читает из основной базы после своего
+# изменяющего запроса, чтобы не видеть отстающую реплику
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'collected_static'
@@ -0,0 +1,69 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import CustomUser
+
+# Денормализованные счётчики: {модель: {поле: (считаемая модель, ссылка)}}.
+COUNTERS = {
+    Recipe: {
+        'favorites_count': (Favorite, 'recipe'),
+        'in_carts_count': (ShoppingCart, 'recipe'),
+    },
+    CustomUser: {
+        'recipes_count': (Recipe, 'author'),
+    },
+}
+
+
+def change_counter(model, pk, field, delta):
+    """
+    Атомарно меняет счётчик строки на delta одним UPDATE с F().
+    Счётчик не уходит ниже нуля, расхождения исправляет
+    reconcile_counters.
+    """
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gt': 0})
+    return rows.update(**{field: F(field) + delta})
+
+
+def _expected(counted_model, link):
+    return Coalesce(
+        Subquery(counted_model.objects.filter(
+            **{link: OuterRef('pk')}
+        ).order_by().values(link).annotate(
+            count=Count('pk')
+        ).values('count')),
+        0,
+        output_field=IntegerField(),
+    )
+
+
+def _stale(model, counters):
+    drift = Q()
+    for field in counters:
+        drift |= ~Q(**{field: F(f'expected_{field}')})
+    return model.objects.annotate(**{
+        f'expected_{field}': _expected(*source)
+        for field, source in counters.items()
+    }).filter(drift)
+
+
+def counters_drift():
+    """ Число строк, счётчики которых расходятся с данными. """
+    return sum(_stale(model, counters).count()
+               for model, counters in COUNTERS.items())
+
+
+def reconcile_counters():
+    """ Пересчитывает расходящиеся счётчики, возвращает число строк. """
+    fixed = 0
+    for model, counters in COUNTERS.items():
+        fixed += model.objects.filter(
+            pk__in=_stale(model, counters).values('pk')
+        ).update(**{
+            field: _expected(*source)
+            for field, source in counters.items()
+        })
+    return fixed
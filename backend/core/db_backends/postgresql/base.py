@@ -0,0 +1,37 @@
+from functools import partial
+
+from django.db.backends.postgresql import base
+
+from core.db_pool import get_pool
+from .creation import DatabaseCreation
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Бэкенд PostgreSQL, который берёт соединения из пула процесса
+    (core.db_pool) и возвращает их туда вместо закрытия.
+    Пул настраивается ключом POOL в настройках базы данных.
+    """
+    creation_class = DatabaseCreation
+
+    def get_pool(self):
+        return get_pool(
+            self.alias, self.settings_dict, self.get_connection_params())
+
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool().checkout(
+            partial(super().get_new_connection, conn_params))
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # Django продолжает ссылаться на соединение, закрытое
+                # внутри транзакции, поэтому оно не возвращается в пул.
+                self.get_pool().discard(self.connection)
+            else:
+                self.get_pool().checkin(self.connection)
@@ -0,0 +1,14 @@
+from django.db.backends.postgresql import creation
+
+from core.db_pool import reset_pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """
+    Перед удалением тестовой базы закрывает свободные соединения
+    пулов: иначе PostgreSQL не удалит базу, к которой подключены.
+    """
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        reset_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
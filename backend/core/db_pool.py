@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+
+from psycopg2 import OperationalError
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE,
+                                 TRANSACTION_STATUS_UNKNOWN)
+
+# Значения по умолчанию для ключа POOL в настройках базы данных.
+POOL_DEFAULTS = {
+    # Наибольшее число соединений процесса, 0 - без переиспользования.
+    'SIZE': 4,
+    # Сколько секунд ждать свободное соединение.
+    'TIMEOUT': 10,
+    # Время жизни соединения, секунды.
+    'MAX_AGE': 600,
+    # Соединение, простаивавшее дольше, проверяется запросом SELECT 1.
+    'CHECK_IDLE': 10,
+}
+
+
+class ConnectionPool:
+    """
+    Пул соединений psycopg2 в памяти процесса, общий для его потоков.
+    Соединений (занятых и свободных) не больше SIZE: запрос
+    сверх этого ждёт освобождения до TIMEOUT секунд. Соединение
+    возвращается в пул при закрытии соединения Django (в конце
+    запроса), незавершённая транзакция откатывается. Перед выдачей
+    соединение проверяется, устаревшие и нерабочие закрываются.
+    """
+
+    def __init__(self, size, timeout, max_age, check_idle):
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.check_idle = check_idle
+        self._condition = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        # Соединения, унаследованные при fork, принадлежат родителю:
+        # ссылки на них сохраняются, чтобы они не закрылись в потомке.
+        self._inherited = list(getattr(self, '_created', {}))
+        self._pid = os.getpid()
+        self._idle = []
+        self._created = {}
+        # Открытые и открываемые сейчас соединения.
+        self._total = 0
+        self.opened = 0
+        self.reused = 0
+        self.discarded = 0
+        self.waits = 0
+        self.timeouts = 0
+
+    def _expired(self, connection, now):
+        return (connection.closed
+                or now - self._created[connection] >= self.max_age)
+
+    def _is_usable(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def _take_idle(self):
+        """ Свободное соединение, пригодное к выдаче, или None. """
+        while True:
+            with self._condition:
+                if not self._idle:
+                    return None
+                connection, last_used = self._idle.pop()
+            now = time.monotonic()
+            if (not self._expired(connection, now)
+                    and (now - last_used < self.check_idle
+                         or self._is_usable(connection))):
+                with self._condition:
+                    self.reused += 1
+                return connection
+            self.discard(connection)
+
+    def _reserve(self):
+        """
+        True - занято место под новое соединение, False - есть
+        свободное соединение. Ждёт не дольше timeout.
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            if os.getpid() != self._pid:
+                self._reset()
+            waited = False
+            while not self._idle:
+                if self._total < self.size or self.size == 0:
+                    self._total += 1
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise OperationalError(
+                        f'Нет свободных соединений в пуле ({self.size}) '
+                        f'за {self.timeout} с')
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                self._condition.wait(remaining)
+            return False
+
+    def checkout(self, connect):
+        """ connect() открывает новое соединение. """
+        while True:
+            if self._reserve():
+                try:
+                    connection = connect()
+                except Exception:
+                    with self._condition:
+                        self._total -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._created[connection] = time.monotonic()
+                    self.opened += 1
+                return connection
+            connection = self._take_idle()
+            if connection is not None:
+                return connection
+
+    def checkin(self, connection):
+        """ Возврат соединения в пул вместо закрытия. """
+        if self.size == 0 or connection not in self._created:
+            return self.discard(connection)
+        try:
+            status = connection.info.transaction_status
+            if status == TRANSACTION_STATUS_UNKNOWN:
+                return self.discard(connection)
+            if status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except Exception:
+            return self.discard(connection)
+        now = time.monotonic()
+        if self._expired(connection, now):
+            return self.discard(connection)
+        with self._condition:
+            self._idle.append((connection, now))
+            self._condition.notify()
+
+    def discard(self, connection):
+        """ Закрывает соединение и освобождает его место в пуле. """
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            if self._created.pop(connection, None) is not None:
+                self._total -= 1
+                self.discarded += 1
+            self._condition.notify()
+
+    def close_idle(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self.discard(connection)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'size': self.size,
+                'connections': self._total,
+                'idle': len(self._idle),
+                'in_use': self._total - len(self._idle),
+                'opened': self.opened,
+                'reused': self.reused,
+                'discarded': self.discarded,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict, conn_params):
+    """
+    Пул для базы данных: свой для каждого алиаса и параметров
+    подключения (тестовая база получает отдельный пул).
+    """
+    key = (alias, repr(sorted(conn_params.items())))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                options = {**POOL_DEFAULTS, **settings_dict.get('POOL', {})}
+                pool = _pools[key] = ConnectionPool(
+                    size=options['SIZE'],
+                    timeout=options['TIMEOUT'],
+                    max_age=options['MAX_AGE'],
+                    check_idle=options['CHECK_IDLE'],
+                )
+    return pool
+
+
+def reset_pools():
+    """ Закрывает свободные соединения и забывает все пулы. """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_idle()
+
+
+def pools_stats():
+    """ Счётчики пулов по алиасам баз данных. """
+    stats = {}
+    for (alias, _), pool in list(_pools.items()):
+        pool_stats = pool.stats()
+        if alias in stats:
+            pool_stats = {
+                name: value if name == 'size' else stats[alias][name] + value
+                for name, value in pool_stats.items()}
+        stats[alias] = pool_stats
+    return stats
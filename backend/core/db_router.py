@@ -0,0 +1,124 @@
+import hashlib
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+from .response_cache import is_shared_cache
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Подписанная cookie: клиент недавно изменял данные.
+STICKY_COOKIE = 'db_sticky'
+STICKY_SALT = 'core.db_router.sticky'
+
+_local = threading.local()
+
+
+def replicas():
+    return settings.DATABASE_REPLICAS
+
+
+@contextmanager
+def use_replicas(enabled):
+    """
+    Включает (или запрещает) чтение с реплик в текущем потоке.
+    Реплика выбирается одна на весь блок (и вложенные блоки),
+    чтобы запросы одного ответа читали согласованные данные.
+    Вне этого блока все запросы идут в основную базу.
+    """
+    previous = getattr(_local, 'replica', None)
+    _local.replica = (previous or random.choice(replicas())
+                      if enabled and replicas() else None)
+    try:
+        yield
+    finally:
+        _local.replica = previous
+
+
+def primary():
+    """ Чтение из основной базы, например при заполнении кэшей. """
+    return use_replicas(False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Запись - в основную базу, чтение - с реплики, выбранной
+    для текущего запроса, если чтение с реплик разрешено
+    (ReplicaRoutingMiddleware). Связанные объекты читаются
+    из той же базы, что и объект, через который к ним обращаются.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return getattr(_local, 'replica', None) or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Разрешает чтение с реплик для безопасных запросов (GET, HEAD,
+    OPTIONS). После успешного изменяющего запроса клиент
+    REPLICA_STICKY_SECONDS секунд читает из основной базы, чтобы
+    видеть свои изменения, даже если реплика отстаёт. Отметка -
+    подписанная cookie со временем выдачи, а для клиентов API,
+    которые не хранят cookie, - ключ по заголовку Authorization
+    в общем кэше Django (если кэш не в памяти процесса).
+    """
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    @staticmethod
+    def token_key(request):
+        """ Ключ отметки клиента с токеном в общем кэше или None. """
+        credentials = request.META.get('HTTP_AUTHORIZATION')
+        if not credentials or not is_shared_cache(
+                caches[DEFAULT_CACHE_ALIAS]):
+            return None
+        digest = hashlib.sha256(credentials.encode()).hexdigest()
+        return f'db-sticky:{digest}'
+
+    def mark_sticky(self, request, response):
+        response.set_signed_cookie(
+            STICKY_COOKIE, '1', salt=STICKY_SALT,
+            max_age=settings.REPLICA_STICKY_SECONDS,
+            secure=request.is_secure(), httponly=True, samesite='Lax')
+        key = self.token_key(request)
+        if key is not None:
+            caches[DEFAULT_CACHE_ALIAS].set(
+                key, True, timeout=settings.REPLICA_STICKY_SECONDS)
+
+    def is_sticky(self, request):
+        if request.get_signed_cookie(
+                STICKY_COOKIE, default=None, salt=STICKY_SALT,
+                max_age=settings.REPLICA_STICKY_SECONDS) is not None:
+            return True
+        key = self.token_key(request)
+        return (key is not None
+                and caches[DEFAULT_CACHE_ALIAS].get(key) is not None)
+
+    def __call__(self, request):
+        if request.method not in SAFE_METHODS:
+            with primary():
+                response = self.get_response(request)
+            # Неудачный запрос ничего не изменил.
+            if response.status_code < 400:
+                self.mark_sticky(request, response)
+            return response
+        with use_replicas(not self.is_sticky(request)):
+            return self.get_response(request)
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+def document_key(kind, rows):
+    """
+    Ключ документа - хэш его вида и данных, из которых он строится:
+    одинаковые данные дают одинаковый ключ (и ETag) у всех процессов.
+    """
+    payload = json.dumps([kind, rows], ensure_ascii=False,
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class DocumentCache:
+    """
+    LRU-кэш готовых документов в памяти процесса, ограниченный
+    суммарным размером документов в байтах.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+            return document
+
+    def set(self, key, document):
+        if len(document) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._documents.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._documents[key] = document
+            self.size += len(document)
+            while self.size > self.max_bytes:
+                _, evicted = self._documents.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+            self.size = 0
+
+
+shopping_list_cache = DocumentCache(settings.SHOPPING_LIST_CACHE_MAX_BYTES)
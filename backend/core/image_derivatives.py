@@ -0,0 +1,75 @@
+import io
+import os
+
+from PIL import Image, ImageOps
+
+# Размеры производных изображений рецепта: (ширина, высота), в пределах
+# которых вписывается изображение с сохранением пропорций.
+DERIVATIVE_SIZES = {
+    'thumb': (320, 240),
+    'card': (640, 480),
+    'full': (1280, 960),
+}
+DERIVATIVE_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True,
+             'progressive': True},
+}
+DERIVATIVES_DIR = 'recipes/derivatives'
+
+
+def render_derivatives(content):
+    """
+    Строит производные изображения из байтов оригинала.
+    Выполняется в дочернем процессе, поэтому работает только с байтами:
+    возвращает {размер: {формат: байты}}.
+    """
+    with Image.open(io.BytesIO(content)) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = 'A' in original.getbands()
+        original = original.convert('RGBA' if has_alpha else 'RGB')
+        result = {}
+        for size, bounds in DERIVATIVE_SIZES.items():
+            image = original.copy()
+            image.thumbnail(bounds, Image.LANCZOS)
+            result[size] = {}
+            for fmt, params in DERIVATIVE_FORMATS.items():
+                target = image
+                if fmt == 'jpeg' and has_alpha:
+                    target = Image.new('RGB', image.size, 'white')
+                    target.paste(image, mask=image.getchannel('A'))
+                buffer = io.BytesIO()
+                target.save(buffer, **params)
+                result[size][fmt] = buffer.getvalue()
+        return result
+
+
+def derivative_name(recipe_id, source, size, fmt):
+    """ Путь производного изображения в хранилище. """
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f'{DERIVATIVES_DIR}/{recipe_id}/{stem}_{size}.{fmt}'
+
+
+def save_derivatives(storage, recipe_id, source, rendered):
+    """
+    Сохраняет производные в хранилище и возвращает
+    описание для Recipe.image_derivatives.
+    """
+    derivatives = {'source': source}
+    for size, formats in rendered.items():
+        derivatives[size] = {
+            fmt: storage.save(
+                derivative_name(recipe_id, source, size, fmt),
+                io.BytesIO(content))
+            for fmt, content in formats.items()
+        }
+    return derivatives
+
+
+def derivative_paths(derivatives):
+    """ Все пути файлов из описания производных. """
+    return [
+        path
+        for size in DERIVATIVE_SIZES
+        for path in (derivatives or {}).get(size, {}).values()
+    ]
@@ -0,0 +1,102 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+from .db_router import primary
+
+
+class _Snapshot:
+    """
+    Неизменяемый снимок каталога ингредиентов.
+    keys - названия в нижнем регистре, отсортированные по алфавиту;
+    haystack - те же названия, склеенные через перевод строки,
+    offsets - позиции начала каждого названия в haystack.
+    """
+    separator = '\n'
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: row['name'].lower())
+        self.rows = rows
+        self.keys = [row['name'].lower() for row in rows]
+        self.offsets = []
+        position = 0
+        for key in self.keys:
+            self.offsets.append(position)
+            position += len(key) + len(self.separator)
+        self.haystack = self.separator.join(self.keys)
+        self.built_at = time.monotonic()
+
+    def prefix_indexes(self, query):
+        index = bisect_left(self.keys, query)
+        while index < len(self.keys) and self.keys[index].startswith(query):
+            yield index
+            index += 1
+
+    def substring_indexes(self, query):
+        position = self.haystack.find(query)
+        while position != -1:
+            index = bisect_right(self.offsets, position) - 1
+            if not self.keys[index].startswith(query):
+                yield index
+            if index + 1 == len(self.offsets):
+                return
+            position = self.haystack.find(query, self.offsets[index + 1])
+
+
+class IngredientIndex:
+    """
+    Индекс каталога ингредиентов в памяти процесса для автодополнения.
+    Загружается при первом поиске, сбрасывается сигналами при изменении
+    ингредиентов и перестраивается не реже чем раз в
+    INGREDIENT_INDEX_TTL секунд, чтобы подхватывать изменения,
+    сделанные в других процессах.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _is_fresh(self, snapshot):
+        ttl = getattr(settings, 'INGREDIENT_INDEX_TTL', None)
+        return snapshot is not None and (
+            ttl is None or time.monotonic() - snapshot.built_at < ttl)
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+        with self._lock, primary():
+            if not self._is_fresh(self._snapshot):
+                self._snapshot = _Snapshot(Ingredient.objects.values(
+                    'id', 'name', 'measurement_unit'))
+            return self._snapshot
+
+    def search(self, query, limit=None):
+        """
+        Возвращает ингредиенты, название которых начинается с query,
+        а за ними - содержащие query в середине названия.
+        Без query возвращается весь каталог.
+        """
+        snapshot = self._get_snapshot()
+        query = query.strip().lower()
+        if not query:
+            return snapshot.rows[:limit]
+        if _Snapshot.separator in query:
+            return []
+        result = []
+        for indexes in (snapshot.prefix_indexes(query),
+                        snapshot.substring_indexes(query)):
+            for index in indexes:
+                if limit is not None and len(result) >= limit:
+                    return result
+                result.append(snapshot.rows[index])
+        return result
+
+
+ingredient_index = IngredientIndex()
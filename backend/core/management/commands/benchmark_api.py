@@ -0,0 +1,181 @@
+import json
+import platform
+import statistics
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import CustomUser
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, percent):
+    """ Перцентиль по методу ближайшего ранга. """
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[rank - 1]
+
+
+def scenarios(recipe, tag, ingredient):
+    """
+    Сценарии нагрузки: имя, путь и нужен ли токен.
+    Данные для путей берутся из базы.
+    """
+    word = recipe.name.split()[0]
+    return [
+        ('recipes_list_anonymous', '/api/recipes/', False),
+        ('recipes_list', '/api/recipes/?limit=6', True),
+        ('recipes_list_deep_page', '/api/recipes/?limit=6&page=50', True),
+        ('recipes_list_cursor', '/api/recipes/?limit=6&cursor=', True),
+        ('recipes_by_tag', f'/api/recipes/?tags={tag.slug}', True),
+        ('recipes_popular', '/api/recipes/?ordering=-favorites_count', True),
+        ('recipes_search', f'/api/recipes/?search={word}', True),
+        ('recipe_detail', f'/api/recipes/{recipe.id}/', True),
+        ('subscriptions', '/api/users/subscriptions/?recipes_limit=3', True),
+        ('users_list', '/api/users/', True),
+        ('download_shopping_cart_pdf',
+         '/api/recipes/download_shopping_cart/?format=pdf', True),
+        ('download_shopping_cart_csv',
+         '/api/recipes/download_shopping_cart/?format=csv', True),
+        ('ingredients_search',
+         f'/api/ingredients/?name={ingredient.name[:2]}', False),
+        ('tags_list', '/api/tags/', False),
+    ]
+
+
+class Command(BaseCommand):
+    """
+    Данный скрипт прогоняет запросы к API через тестовый клиент
+    Django (с middleware, аутентификацией и сериализацией) и
+    выводит JSON с перцентилями времени ответа и числом запросов
+    к базе данных по каждому сценарию, чтобы сравнивать прогоны.
+    Данные для нагрузки создаются командой seed_data.
+    Запуск: python manage.py benchmark_api [--iterations N]
+    [--scenario имя ...] [--output файл.json]
+    """
+    help = 'Замеряет время ответа и число запросов к базе у эндпоинтов API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            dest='scenarios',
+            help='Запустить только указанные сценарии',
+        )
+        parser.add_argument(
+            '--username',
+            help='Пользователь для запросов с токеном, по умолчанию '
+                 'пользователь с самой большой корзиной покупок',
+        )
+        parser.add_argument('--output', help='Файл для результатов')
+
+    def get_user(self, username):
+        if username:
+            user = CustomUser.objects.filter(username=username).first()
+        else:
+            user = CustomUser.objects.annotate(
+                cart_size=Count('shopping_cart')
+            ).order_by('-cart_size', 'id').first()
+        if user is None:
+            raise CommandError('Нет пользователя, запустите seed_data')
+        return user
+
+    def measure(self, client, path, iterations, warmup):
+        timings = []
+        queries = []
+        for iteration in range(warmup + iterations):
+            # Запросы считаются во всех базах: чтение может уйти
+            # на реплику (core.db_router).
+            with ExitStack() as stack:
+                contexts = [
+                    stack.enter_context(
+                        CaptureQueriesContext(connections[alias]))
+                    for alias in connections]
+                started = time.perf_counter()
+                response = client.get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{path}: ответ {response.status_code}')
+            if iteration >= warmup:
+                timings.append(elapsed)
+                queries.append(sum(map(len, contexts)))
+        result = {
+            'path': path,
+            'iterations': iterations,
+            'mean_ms': round(statistics.mean(timings), 3),
+            'min_ms': round(min(timings), 3),
+            'max_ms': round(max(timings), 3),
+            'queries': max(queries),
+        }
+        for percent in PERCENTILES:
+            result[f'p{percent}_ms'] = round(
+                percentile(timings, percent), 3)
+        return result
+
+    def handle(self, *args, **options):
+        recipe = Recipe.objects.order_by('id').first()
+        tag = Tag.objects.order_by('id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        if recipe is None or tag is None or ingredient is None:
+            raise CommandError('Нет данных, запустите seed_data')
+        user = self.get_user(options['username'])
+        token, _ = Token.objects.get_or_create(user=user)
+
+        selected = scenarios(recipe, tag, ingredient)
+        if options['scenarios']:
+            unknown = set(options['scenarios']) - {
+                name for name, _, _ in selected}
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+            selected = [scenario for scenario in selected
+                        if scenario[0] in options['scenarios']]
+
+        anonymous = Client()
+        authorized = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, path, needs_token in selected:
+                client = authorized if needs_token else anonymous
+                results[name] = self.measure(
+                    client, path, options['iterations'], options['warmup'])
+                self.stderr.write(
+                    f'{name}: p50 {results[name]["p50_ms"]} мс, '
+                    f'p95 {results[name]["p95_ms"]} мс, '
+                    f'запросов {results[name]["queries"]}')
+
+        report = json.dumps({
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'dataset': {
+                'users': CustomUser.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'ingredients': Ingredient.objects.count(),
+                'user': user.username,
+            },
+            'scenarios': results,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
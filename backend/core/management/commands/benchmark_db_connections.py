@@ -0,0 +1,101 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from core.db_pool import reset_pools
+from recipes.models import Ingredient
+from .benchmark_api import PERCENTILES, percentile
+
+
+class Command(BaseCommand):
+    """
+    Данный скрипт сравнивает время ответа API с новым соединением
+    с базой данных на каждый запрос (пул размером 0) и с соединениями
+    из пула процесса, и выводит JSON с перцентилями, разницей
+    и счётчиками пула (открыто, переиспользовано, закрыто).
+    Запуск: python manage.py benchmark_db_connections [--iterations N]
+    [--path /api/...] [--output файл.json]
+    """
+    help = 'Замеряет выигрыш от переиспользования соединений с базой данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--path',
+            help='Путь запроса, по умолчанию - первый ингредиент',
+        )
+        parser.add_argument('--output', help='Файл для результатов')
+
+    def measure(self, client, path, size, iterations, warmup):
+        connection.close()
+        reset_pools()
+        pool_settings = connection.settings_dict.setdefault('POOL', {})
+        configured = dict(pool_settings)
+        pool_settings['SIZE'] = size
+        try:
+            timings = []
+            for iteration in range(warmup + iterations):
+                started = time.perf_counter()
+                response = client.get(path)
+                # Тестовый клиент не закрывает соединения по сигналам
+                # запроса, как обработчик запросов Django.
+                close_old_connections()
+                elapsed = (time.perf_counter() - started) * 1000
+                if response.status_code != 200:
+                    raise CommandError(f'{path}: ответ {response.status_code}')
+                if iteration >= warmup:
+                    timings.append(elapsed)
+            stats = connection.get_pool().stats()
+        finally:
+            connection.close()
+            reset_pools()
+            pool_settings.clear()
+            pool_settings.update(configured)
+        result = {
+            'pool_size': size,
+            'mean_ms': round(statistics.mean(timings), 3),
+        }
+        for percent in PERCENTILES:
+            result[f'p{percent}_ms'] = round(
+                percentile(timings, percent), 3)
+        result['pool'] = stats
+        return result
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path is None:
+            ingredient = Ingredient.objects.order_by('id').first()
+            if ingredient is None:
+                raise CommandError('Нет ингредиентов, запустите recipes_json')
+            path = f'/api/ingredients/{ingredient.id}/'
+        size = connection.settings_dict.get('POOL', {}).get('SIZE') or 1
+
+        client = Client()
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            results = {
+                mode: self.measure(client, path, pool_size,
+                                   options['iterations'], options['warmup'])
+                for mode, pool_size in (('direct', 0), ('pooled', size))
+            }
+        results['saved_per_request_ms'] = {
+            f'p{percent}': round(results['direct'][f'p{percent}_ms']
+                                 - results['pooled'][f'p{percent}_ms'], 3)
+            for percent in PERCENTILES
+        }
+        self.stderr.write(
+            f'{path}: без пула p50 {results["direct"]["p50_ms"]} мс, '
+            f'с пулом p50 {results["pooled"]["p50_ms"]} мс')
+
+        report = json.dumps({'path': path, **results},
+                            ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
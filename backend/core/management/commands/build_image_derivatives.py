@@ -0,0 +1,126 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.image_derivatives import (derivative_paths, render_derivatives,
+                                    save_derivatives)
+from core.response_cache import recipes_response_cache
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Данный скрипт строит уменьшенные копии изображений рецептов
+    (thumb, card, full в WebP и JPEG) в пуле процессов.
+    Без --watch обрабатывает все рецепты без актуальных копий
+    и завершается (заполнение для существующих рецептов),
+    с --watch работает как фоновый обработчик новых изображений.
+    Запуск: python manage.py build_image_derivatives [--watch]
+    [--workers N] [--force]
+    """
+    help = 'Строит уменьшенные копии изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Количество процессов для обработки изображений',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Количество изображений, читаемых в память за раз',
+        )
+        parser.add_argument(
+            '--watch',
+            action='store_true',
+            help='Не завершаться, а ждать новые изображения',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Пауза между проверками в режиме --watch, секунды',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Перестроить копии всех рецептов',
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        # Дочерние процессы не должны наследовать соединения с БД.
+        # При fork все процессы пула создаются первой задачей, поэтому
+        # она отправляется до первого запроса к базе.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            pool.submit(int).result()
+            recipes = Recipe.objects.order_by('id')
+            if not options['force']:
+                recipes = recipes.pending_derivatives()
+            while True:
+                last_id = 0
+                while True:
+                    batch = list(recipes.filter(id__gt=last_id).values(
+                        'id', 'image', 'image_derivatives'
+                    )[:options['batch_size']])
+                    if not batch:
+                        break
+                    last_id = batch[-1]['id']
+                    processed += self.process_batch(pool, batch)
+                if not options['watch']:
+                    break
+                recipes = Recipe.objects.order_by('id').pending_derivatives()
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}'))
+
+    def process_batch(self, pool, batch):
+        futures = {}
+        for recipe in batch:
+            try:
+                with default_storage.open(recipe['image']) as file:
+                    content = file.read()
+            except OSError as error:
+                self.store(recipe, {'source': recipe['image'],
+                                    'error': str(error)})
+                continue
+            futures[pool.submit(render_derivatives, content)] = recipe
+        for future in as_completed(futures):
+            recipe = futures[future]
+            try:
+                derivatives = save_derivatives(
+                    default_storage, recipe['id'], recipe['image'],
+                    future.result())
+            except Exception as error:
+                derivatives = {'source': recipe['image'],
+                               'error': str(error)}
+            self.store(recipe, derivatives)
+        return len(batch)
+
+    def store(self, recipe, derivatives):
+        """
+        Записывает копии, только если изображение рецепта не сменилось
+        за время обработки, и удаляет ставшие ненужными файлы.
+        """
+        updated = Recipe.objects.filter(
+            pk=recipe['id'], image=recipe['image']
+        ).bump_version(image_derivatives=derivatives)
+        if updated:
+            recipes_response_cache.invalidate('recipes')
+            stale = set(derivative_paths(recipe['image_derivatives'])) - set(
+                derivative_paths(derivatives))
+        else:
+            stale = derivative_paths(derivatives)
+        for path in stale:
+            default_storage.delete(path)
+        if 'error' in derivatives:
+            self.stderr.write(
+                f'Рецепт {recipe["id"]}: {derivatives["error"]}')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.transaction import atomic
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    """
+    Данный скрипт пересобирает денормализованные списки покупок
+    пользователей по их корзинам или проверяет их на расхождения.
+    Запуск: python manage.py rebuild_shopping_lists [--check]
+    """
+    help = 'Пересобирает списки покупок по корзинам пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, не изменяя данные',
+        )
+
+    def handle(self, *args, **options):
+        drift = ShoppingListItem.objects.count_drift()
+        if options['check']:
+            if drift:
+                raise CommandError(
+                    f'Расхождений в списках покупок: {drift}')
+            self.stdout.write('Расхождений в списках покупок нет')
+            return
+        with atomic():
+            rows = ShoppingListItem.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено расхождений: {drift}, '
+            f'строк в списках покупок: {rows}'))
@@ -1,29 +1,127 @@
+import csv
 import json
+import os
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 from recipes.models import Ingredient
 
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(file):
+    """
+    Потоково читает JSON-массив объектов, не загружая файл в память.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), ''):
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise CommandError('Ожидался JSON-массив ингредиентов')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item['name'], item['measurement_unit']
+        buffer = buffer[position:]
+    raise CommandError('JSON-массив ингредиентов не завершён')
+
+
+def iter_csv(file):
+    """
+    Читает строки CSV вида: название,единица измерения.
+    Пустые строки пропускаются.
+    """
+    reader = csv.reader(file)
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        if len(row) < 2:
+            raise CommandError(
+                f'Строка {reader.line_num}: ожидались название '
+                f'и единица измерения')
+        if row != ['name', 'measurement_unit']:
+            yield row[0], row[1]
+
+
+READERS = {
+    '.json': iter_json_array,
+    '.csv': iter_csv,
+}
+
 
 class Command(BaseCommand):
     """
-    Данный скрипт наполняет базу данных информацией
-    из файла .json.
-    Файл находится в ../static/data/ingredients.json
-    Запуск: python manage.py recipes_json
+    Данный скрипт наполняет базу данных ингредиентами
+    из файла .json или .csv. Файл читается потоково, повторы
+    отбрасываются, запись идёт пачками через bulk_create,
+    уже существующие ингредиенты пропускаются, поэтому
+    повторный запуск безопасен.
+    По умолчанию файл находится в ../static/data/ingredients.json
+    Запуск: python manage.py recipes_json [путь] [--batch-size N]
     """
-    help = 'Загружает ингредиенты из JSON файла в базу данных'
+    help = 'Загружает ингредиенты из JSON или CSV файла в базу данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='static/data/ingredients.json',
+            help='Путь к файлу .json или .csv',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество ингредиентов в одном INSERT',
+        )
 
     def handle(self, *args, **options):
-        json_path = 'static/data/ingredients.json'
-
-        with open(json_path, encoding='utf-8') as file:
-            json_data = json.load(file)
-            for ingredient in json_data:
-                if not Ingredient.objects.filter(
-                        name=ingredient['name'],
-                        measurement_unit=ingredient['measurement_unit']
-                ).exists():
-                    Ingredient.objects.create(
-                        name=ingredient['name'],
-                        measurement_unit=ingredient['measurement_unit'])
+        path = options['path']
+        batch_size = options['batch_size']
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .json и .csv')
+
+        started = time.monotonic()
+        count_before = Ingredient.objects.count()
+        read = 0
+        seen = set()
+        batch = []
+        with open(path, encoding='utf-8', newline='') as file:
+            for name, measurement_unit in reader(file):
+                read += 1
+                key = (name.strip(), measurement_unit.strip())
+                if not all(key) or key in seen:
+                    continue
+                seen.add(key)
+                batch.append(Ingredient(
+                    name=key[0], measurement_unit=key[1]))
+                if len(batch) >= batch_size:
+                    Ingredient.objects.bulk_create(
+                        batch, ignore_conflicts=True)
+                    batch = []
+        if batch:
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+
+        elapsed = time.monotonic() - started
+        added = Ingredient.objects.count() - count_before
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано строк: {read}, уникальных: {len(seen)}, '
+            f'добавлено: {added} за {elapsed:.2f} с '
+            f'({read / elapsed:.0f} строк/с)'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.transaction import atomic
+
+from core.counters import counters_drift, reconcile_counters
+
+
+class Command(BaseCommand):
+    """
+    Данный скрипт пересчитывает счётчики рецептов (в избранном,
+    в корзинах) и пользователей (количество рецептов) по данным
+    или проверяет их на расхождения.
+    Запуск: python manage.py reconcile_counters [--check]
+    """
+    help = 'Пересчитывает денормализованные счётчики'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, не изменяя данные',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = counters_drift()
+            if drift:
+                raise CommandError(f'Расхождений в счётчиках: {drift}')
+            self.stdout.write('Расхождений в счётчиках нет')
+            return
+        with atomic():
+            fixed = reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено строк со счётчиками: {fixed}'))
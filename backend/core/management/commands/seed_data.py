@@ -0,0 +1,155 @@
+import io
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic
+from django.utils import timezone
+from PIL import Image
+
+from core.counters import reconcile_counters
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, ShoppingCart, ShoppingListItem, Tag)
+from users.models import CustomUser, Subscription
+
+IMAGE_NAME = 'recipes/images/synthetic.png'
+TAG_COLORS = ['#E26C2D', '#49B64E', '#8775D2', '#F0C419', '#3A9AD9']
+
+
+def synthetic_image():
+    """ Одна картинка на все синтетические рецепты. """
+    if not default_storage.exists(IMAGE_NAME):
+        buffer = io.BytesIO()
+        Image.new('RGB', (480, 320), '#E26C2D').save(buffer, 'PNG')
+        default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+    return IMAGE_NAME
+
+
+class Command(BaseCommand):
+    """
+    Данный скрипт наполняет базу данных синтетическими
+    пользователями, рецептами с ингредиентами и тэгами, избранным,
+    корзинами и подписками для нагрузочного тестирования.
+    Запись идёт пачками через bulk_create, поэтому сигналы
+    не срабатывают: поисковые векторы, списки покупок
+    и счётчики пересчитываются в конце.
+    Ингредиенты берутся из каталога (см. recipes_json).
+    Запуск: python manage.py seed_data [--users N] [--recipes N] ...
+    """
+    help = 'Наполняет базу данных синтетическими данными'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=5)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags-per-recipe', type=int, default=2)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--carts-per-user', type=int, default=5)
+        parser.add_argument(
+            '--subscriptions-per-user', type=int, default=10)
+        parser.add_argument(
+            '--prefix',
+            default='synthetic',
+            help='Префикс имён пользователей, должен быть уникальным '
+                 'для каждого запуска',
+        )
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Зерно генератора случайных чисел')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def bulk(self, model, objects):
+        return model.objects.bulk_create(
+            objects, batch_size=self.batch_size)
+
+    def sample(self, population, size):
+        return self.random.sample(population, min(size, len(population)))
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        started = time.monotonic()
+
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredient_ids:
+            ingredient_ids = [ingredient.id for ingredient in self.bulk(
+                Ingredient,
+                [Ingredient(name=f'{prefix} ингредиент {number}',
+                            measurement_unit='г') for number in range(500)]
+            )]
+        with atomic():
+            tags = list(Tag.objects.all())
+            if len(tags) < options['tags']:
+                tags += self.bulk(Tag, [
+                    Tag(name=f'{prefix} тэг {number}',
+                        slug=f'{prefix}-{number}',
+                        color=TAG_COLORS[number % len(TAG_COLORS)])
+                    for number in range(len(tags), options['tags'])
+                ])
+
+            password = make_password(f'{prefix}-password')
+            users = self.bulk(CustomUser, [
+                CustomUser(username=f'{prefix}{number}',
+                           email=f'{prefix}{number}@example.com',
+                           first_name='Синтетический',
+                           last_name=f'Пользователь {number}',
+                           password=password)
+                for number in range(options['users'])
+            ])
+            user_ids = [user.id for user in users]
+
+            image = synthetic_image()
+            now = timezone.now()
+            recipes = self.bulk(Recipe, [
+                Recipe(name=f'Рецепт {prefix} {number}',
+                       text=f'Описание рецепта {number}. ' * 10,
+                       cooking_time=self.random.randint(5, 180),
+                       image=image,
+                       author_id=self.random.choice(user_ids),
+                       pub_date=now - timedelta(
+                           minutes=options['recipes'] - number))
+                for number in range(options['recipes'])
+            ])
+            recipe_ids = [recipe.id for recipe in recipes]
+
+            self.bulk(RecipeIngredient, [
+                RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient,
+                                 amount=self.random.randint(1, 500))
+                for recipe_id in recipe_ids
+                for ingredient in self.sample(
+                    ingredient_ids, options['ingredients_per_recipe'])
+            ])
+            self.bulk(RecipeTag, [
+                RecipeTag(recipe_id=recipe_id, tag=tag)
+                for recipe_id in recipe_ids
+                for tag in self.sample(tags, options['tags_per_recipe'])
+            ])
+            for model, per_user in ((Favorite, 'favorites_per_user'),
+                                    (ShoppingCart, 'carts_per_user')):
+                self.bulk(model, [
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in user_ids
+                    for recipe_id in self.sample(
+                        recipe_ids, options[per_user])
+                ])
+            self.bulk(Subscription, [
+                Subscription(user_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in self.sample(
+                    user_ids, options['subscriptions_per_user'])
+                if author_id != user_id
+            ])
+
+            Recipe.objects.filter(id__in=recipe_ids).update_search_vector()
+            ShoppingListItem.objects.rebuild()
+            reconcile_counters()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)} '
+            f'за {time.monotonic() - started:.2f} с'))
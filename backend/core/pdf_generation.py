@@ -1,25 +1,79 @@
+import os
+from functools import lru_cache
+
+from django.conf import settings
 from fpdf import FPDF
 
+FONT_FAMILY = 'DejaVu'
+FONT_PATH = os.path.join(
+    settings.BASE_DIR, 'static', 'fonts', 'DejaVuSansCondensed.ttf')
+CHUNK_SIZE = 64 * 1024
+
+
+class GlyphSubset(list):
+    """
+    Набор символов шрифта для встраивания в документ.
+    FPDF добавляет сюда каждый выведенный символ и при сохранении
+    проверяет вхождение для всех 65536 кодов, поэтому список
+    хранит коды без повторов и проверяет вхождение по множеству.
+    """
+
+    def __init__(self, codes=()):
+        super().__init__()
+        self._codes = set()
+        for code in codes:
+            self.append(code)
+
+    def append(self, code):
+        if code not in self._codes:
+            self._codes.add(code)
+            super().append(code)
+
+    def __contains__(self, code):
+        return code in self._codes
+
+    def __delitem__(self, index):
+        self._codes.discard(self[index])
+        super().__delitem__(index)
+
+
+@lru_cache(maxsize=None)
+def load_font():
+    """
+    Разбирает TTF-шрифт один раз на процесс и возвращает
+    описание шрифта и файлов шрифта в формате FPDF.
+    """
+    pdf = FPDF()
+    pdf.alias_nb_pages()
+    pdf.add_font(FONT_FAMILY, '', FONT_PATH, uni=True)
+    return pdf.fonts[FONT_FAMILY.lower()], pdf.font_files
+
 
 class ShoppingListPDF(FPDF):
     """
     Кастомная реализация класса FPDF.
     Прописан header и footer, показывающий номер и количество страниц,
     а так же название проекта, откуда был скачан pdf-файл.
+    Шрифт берётся из кэша процесса, а не разбирается заново.
     """
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.alias_nb_pages()
+        font, font_files = load_font()
+        # subset пополняется символами документа, поэтому копируется.
+        self.fonts[FONT_FAMILY.lower()] = dict(
+            font, i=len(self.fonts) + 1, subset=GlyphSubset(font['subset']))
+        self.font_files.update(
+            {name: dict(info) for name, info in font_files.items()})
+
     def header(self):
-        self.add_font(
-            'DejaVu', '',
-            'static/fonts/DejaVuSansCondensed.ttf',
-            uni=True
-        )
-        self.set_font('DejaVu', '', 16)
+        self.set_font(FONT_FAMILY, '', 16)
         self.cell(200, 10, txt='Ваш список покупок:', ln=1, align="C")
 
     def footer(self):
         self.set_y(-15)
-        self.set_font("DejaVu", "", 12)
+        self.set_font(FONT_FAMILY, "", 12)
         self.cell(0, 10,
                   f"Страница {self.page_no()} из {self.alias_nb_pages()}",
                   align="C")
@@ -30,20 +84,15 @@ def generate_pdf(queryset):
     """
     Функция, по генерации pdf-файла из отфильтрованного
     django queryset. dest='S' подразумевает возврат файла
-    в строковом представлении, response в view функции отвечает
-    за сигнатуру.
+    в строковом представлении (latin-1), для отдачи
+    используется iter_pdf_chunks.
 
     :param queryset:
     :return: string
     """
     pdf = ShoppingListPDF(orientation='P', unit='mm', format='A4')
     pdf.add_page()
-    pdf.add_font(
-        'DejaVu', '',
-        'static/fonts/DejaVuSansCondensed.ttf',
-        uni=True
-    )
-    pdf.set_font('DejaVu', '', 16)
+    pdf.set_font(FONT_FAMILY, '', 16)
     for ingredient in queryset:
         pdf.cell(w=0, h=10, ln=1,
                  txt=(f'{ingredient["ingredient__name"]}'
@@ -51,6 +100,13 @@ def generate_pdf(queryset):
                       f' {ingredient["ingredient__measurement_unit"]}'),
                  align='L')
 
-    result = pdf.output(dest='S').encode('latin-1')
+    return pdf.output(dest='S')
+
 
-    return result
+def iter_pdf_chunks(document, chunk_size=CHUNK_SIZE):
+    """
+    Отдаёт документ частями в байтах, не создавая
+    полную байтовую копию строки документа.
+    """
+    for start in range(0, len(document), chunk_size):
+        yield document[start:start + chunk_size].encode('latin-1')
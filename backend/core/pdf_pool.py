@@ -0,0 +1,160 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .pdf_generation import generate_pdf
+
+
+class RenderUnavailable(APIException):
+    """
+    Документ сейчас не может быть построен. Поле wait DRF
+    отдаёт в заголовке Retry-After.
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = ('Сервис формирования документов перегружен, '
+                      'повторите запрос позже.')
+    default_code = 'render_unavailable'
+
+    def __init__(self, detail=None, code=None):
+        super().__init__(detail, code)
+        self.wait = settings.PDF_RENDER_RETRY_AFTER
+
+
+class RenderTimeout(RenderUnavailable):
+    default_detail = ('Документ не успел сформироваться, '
+                      'повторите запрос позже.')
+    default_code = 'render_timeout'
+
+
+def _render(rows):
+    """ Выполняется в процессе пула: документ и время построения. """
+    started = time.perf_counter()
+    document = generate_pdf(rows)
+    return document, time.perf_counter() - started
+
+
+class RenderPool:
+    """
+    Пул процессов для построения PDF, общий для потоков процесса
+    веб-сервера. Процессы запускаются через forkserver при первом
+    запросе. Одновременно в пуле (в работе и в очереди) не больше
+    workers + queue_limit документов: сверх этого запрос сразу
+    получает 503, а не ждёт. Ответ ждётся не дольше timeout секунд,
+    место в пуле освобождается, когда процесс закончит работу.
+    """
+
+    def __init__(self, workers, queue_limit, timeout):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = dict.fromkeys(
+            ('submitted', 'completed', 'rejected', 'timeouts', 'failures'),
+            0)
+        self._render_seconds = 0.0
+        self._render_max_seconds = 0.0
+        self._served = 0
+        self._wait_seconds = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('forkserver'))
+            return self._executor
+
+    def _count(self, name, in_flight=0):
+        with self._lock:
+            self._counters[name] += 1
+            self._in_flight += in_flight
+
+    def _release(self, future):
+        self._slots.release()
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self._counters['failures'] += 1
+                return
+            self._counters['completed'] += 1
+            _, seconds = future.result()
+            self._render_seconds += seconds
+            self._render_max_seconds = max(self._render_max_seconds, seconds)
+
+    def render(self, rows):
+        """ Строит PDF из строк списка покупок в процессе пула. """
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise RenderUnavailable()
+        self._count('submitted', in_flight=1)
+        started = time.perf_counter()
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_render, rows)
+        except BrokenProcessPool:
+            self._reset(executor)
+            self._slots.release()
+            self._count('failures', in_flight=-1)
+            raise RenderUnavailable()
+        future.add_done_callback(self._release)
+        try:
+            document, _ = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._count('timeouts')
+            raise RenderTimeout()
+        except BrokenProcessPool:
+            self._reset(executor)
+            raise RenderUnavailable()
+        with self._lock:
+            self._served += 1
+            self._wait_seconds += time.perf_counter() - started
+        return document
+
+    def _reset(self, executor):
+        """
+        Пул с упавшим процессом больше не принимает задачи,
+        следующий запрос создаст новый.
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            completed = self._counters['completed']
+            return {
+                'workers': self.workers,
+                'queue_limit': self.queue_limit,
+                'timeout': self.timeout,
+                'in_flight': self._in_flight,
+                'queued': max(0, self._in_flight - self.workers),
+                **self._counters,
+                'render_avg_ms': round(
+                    self._render_seconds * 1000 / completed, 3
+                ) if completed else None,
+                'render_max_ms': round(self._render_max_seconds * 1000, 3),
+                'response_avg_ms': round(
+                    self._wait_seconds * 1000 / self._served, 3
+                ) if self._served else None,
+            }
+
+
+pdf_pool = RenderPool(
+    workers=settings.PDF_RENDER_WORKERS,
+    queue_limit=settings.PDF_RENDER_QUEUE_LIMIT,
+    timeout=settings.PDF_RENDER_TIMEOUT,
+)
@@ -0,0 +1,106 @@
+import gzip
+import hashlib
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from .db_router import primary
+
+# Кодировка из Accept-Encoding и её вес: "gzip;q=0.5".
+ACCEPT_ENCODING_RE = re.compile(
+    r'^\s*([^\s;]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?', re.IGNORECASE)
+
+
+def accepts_gzip(request):
+    """
+    Принимает ли клиент gzip: кодировка gzip (или *, если gzip
+    не указан отдельно) с ненулевым весом q.
+    """
+    weights = {}
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        match = ACCEPT_ENCODING_RE.match(coding)
+        if match is None:
+            continue
+        try:
+            weight = float(match.group(2) or 1)
+        except ValueError:
+            weight = 0
+        weights[match.group(1).lower()] = weight
+    return weights.get('gzip', weights.get('*', 0)) > 0
+
+
+class _Document:
+    """
+    Готовое тело ответа в JSON и его сжатая gzip копия.
+    У каждого представления свой строгий ETag.
+    """
+
+    def __init__(self, data):
+        self.body = JSONRenderer().render(data)
+        self.gzipped = gzip.compress(self.body, mtime=0)
+        digest = hashlib.sha256(self.body).hexdigest()
+        self.etag = quote_etag(digest)
+        self.gzip_etag = quote_etag(f'{digest}-gzip')
+        self.built_at = time.monotonic()
+
+
+class ReferenceCache:
+    """
+    Кэш справочника (тэги, ингредиенты) в памяти процесса.
+    Документ собирается при первом запросе, сбрасывается сигналами
+    при изменении данных и перестраивается не реже чем раз в
+    REFERENCE_CACHE_TTL секунд, чтобы подхватывать изменения,
+    сделанные в других процессах.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._document = None
+
+    def invalidate(self):
+        self._document = None
+
+    def _is_fresh(self, document):
+        ttl = getattr(settings, 'REFERENCE_CACHE_TTL', None)
+        return document is not None and (
+            ttl is None or time.monotonic() - document.built_at < ttl)
+
+    def get(self, build):
+        """ build() возвращает данные справочника для сериализации. """
+        document = self._document
+        if self._is_fresh(document):
+            return document
+        with self._lock, primary():
+            if not self._is_fresh(self._document):
+                self._document = _Document(build())
+            return self._document
+
+    def response(self, request, build):
+        """
+        Ответ с готовым документом: сжатым, если клиент принимает gzip,
+        или 304, если у клиента актуальная копия.
+        """
+        document = self.get(build)
+        use_gzip = accepts_gzip(request)
+        etag = document.gzip_etag if use_gzip else document.etag
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(
+                document.gzipped if use_gzip else document.body,
+                content_type='application/json')
+            if use_gzip:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, no-cache'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+tags_cache = ReferenceCache()
+ingredients_cache = ReferenceCache()
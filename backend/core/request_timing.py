@@ -0,0 +1,146 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    """ Метрики одного запроса, время в миллисекундах. """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.serialization_ms = 0.0
+        self.render_ms = 0.0
+        self.view_name = None
+        self._render_started = None
+        self._serialization_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """ Обёртка выполнения SQL (connection.execute_wrapper). """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_ms += (time.perf_counter() - started) * 1000
+
+
+def _timed_data(data):
+    """
+    Замеряет вычисление serializer.data. Вложенные сериализаторы
+    вызываются через to_representation, поэтому время считается
+    только для внешнего сериализатора ответа.
+    """
+
+    @wraps(data)
+    def wrapper(serializer):
+        metrics = getattr(_local, 'metrics', None)
+        if metrics is None or metrics._serialization_depth:
+            return data(serializer)
+        metrics._serialization_depth += 1
+        started = time.perf_counter()
+        try:
+            return data(serializer)
+        finally:
+            metrics._serialization_depth -= 1
+            metrics.serialization_ms += (time.perf_counter() - started) * 1000
+
+    wrapper.timed = True
+    return wrapper
+
+
+def view_name(view_func, method):
+    """ Имя обработчика вида RecipeViewSet.list. """
+    view_class = getattr(view_func, 'cls', None) or getattr(
+        view_func, 'view_class', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__qualname__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+class RequestTimingMiddleware:
+    """
+    Считает для каждого запроса число и время SQL-запросов,
+    время сериализации, рендеринга и общее время обработки,
+    отдаёт их в заголовке Server-Timing и пишет предупреждение
+    в лог, если превышен бюджет запросов к БД или времени ответа.
+    Включается настройкой REQUEST_TIMING_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.query_budget = settings.REQUEST_TIMING_QUERY_BUDGET
+        self.latency_budget = settings.REQUEST_TIMING_LATENCY_BUDGET_MS
+        if not getattr(BaseSerializer.data.fget, 'timed', False):
+            BaseSerializer.data = property(_timed_data(
+                BaseSerializer.data.fget))
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        _local.metrics = metrics
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        total_ms = (time.perf_counter() - started) * 1000
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={metrics.db_ms:.1f};desc="{metrics.queries} queries"',
+            f'serialize;dur={metrics.serialization_ms:.1f}',
+            f'render;dur={metrics.render_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ))
+        if (metrics.queries > self.query_budget
+                or total_ms > self.latency_budget):
+            logger.warning(
+                'Медленный запрос %s %s (%s): %d запросов к БД за %.1f мс, '
+                'сериализация %.1f мс, всего %.1f мс',
+                request.method, request.path, metrics.view_name,
+                metrics.queries, metrics.db_ms,
+                metrics.serialization_ms, total_ms,
+                extra={
+                    'view': metrics.view_name,
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'queries': metrics.queries,
+                    'db_ms': round(metrics.db_ms, 1),
+                    'serialization_ms': round(metrics.serialization_ms, 1),
+                    'render_ms': round(metrics.render_ms, 1),
+                    'total_ms': round(total_ms, 1),
+                },
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _local.metrics.view_name = view_name(
+            view_func, request.method.lower())
+
+    def process_template_response(self, request, response):
+        """ Ответы DRF рендерятся сразу после этого вызова. """
+        metrics = _local.metrics
+        metrics._render_started = time.perf_counter()
+
+        def rendered(response):
+            metrics.render_ms += (
+                time.perf_counter() - metrics._render_started) * 1000
+
+        response.add_post_render_callback(rendered)
+        return response
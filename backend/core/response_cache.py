@@ -0,0 +1,105 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+# Кэши Django, которые не видны другим процессам.
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def is_shared_cache(cache):
+    """ Кэш общий для процессов (Redis), а не в памяти процесса. """
+    return not isinstance(cache, PROCESS_LOCAL_CACHES)
+
+
+class CacheGenerations:
+    """
+    Номера поколений данных в кэше Django (CACHES), общие
+    для процессов, если кэш разделяемый. Сохранённое вместе
+    с номером поколения значение устаревает, когда номер
+    увеличивается.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        return caches[settings.RESPONSE_CACHE_ALIAS]
+
+    def _key(self, name):
+        return f'{self.prefix}:generation:{name}'
+
+    def bump(self, name):
+        key = self._key(name)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Вытесненное поколение начинается с нового значения,
+            # чтобы не совпасть с номерами уже сохранённых значений.
+            self.cache.add(key, time.time_ns(), timeout=None)
+
+    def invalidate(self, *names):
+        """ Новые поколения данных после фиксации текущей транзакции. """
+        for name in names:
+            transaction.on_commit(lambda name=name: self.bump(name))
+
+    def get(self, names):
+        keys = {self._key(name): name for name in names}
+        found = self.cache.get_many(keys)
+        for key in keys.keys() - found.keys():
+            self.cache.add(key, time.time_ns(), timeout=None)
+            found[key] = self.cache.get(key)
+        return [found[key] for key in keys]
+
+
+class ResponseCache:
+    """
+    Кэш готовых данных ответов в кэше Django (CACHES). Ключ ответа
+    включает номера поколений данных, от которых он зависит:
+    сигналы увеличивают номер поколения после фиксации транзакции,
+    и старые ответы больше не находятся, а со временем вытесняются
+    по RESPONSE_CACHE_TTL.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.generations = CacheGenerations(prefix)
+
+    @property
+    def cache(self):
+        return self.generations.cache
+
+    def invalidate(self, *names):
+        self.generations.invalidate(*names)
+
+    def key(self, request, generations):
+        """
+        Ключ ответа: адрес без параметров, параметры запроса
+        в порядке имён и значений, формат ответа и поколения данных.
+        """
+        params = sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists())
+        payload = json.dumps([
+            request.build_absolute_uri(request.path),
+            params,
+            request.accepted_renderer.format,
+            self.generations.get(generations),
+        ], ensure_ascii=False)
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        return f'{self.prefix}:response:{digest}'
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, timeout=settings.RESPONSE_CACHE_TTL)
+
+
+recipes_response_cache = ResponseCache('recipes')
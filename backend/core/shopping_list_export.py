@@ -0,0 +1,49 @@
+import csv
+import json
+
+
+def _rows(queryset):
+    for ingredient in queryset:
+        yield (ingredient['ingredient__name'],
+               ingredient['total_amount'],
+               ingredient['ingredient__measurement_unit'])
+
+
+def iter_text(queryset):
+    """ Список покупок в виде текста, по строке на ингредиент. """
+    for name, amount, unit in _rows(queryset):
+        yield f'{name} - {amount} {unit}\n'.encode('utf-8')
+
+
+class _Echo:
+    """ Псевдо-файл для csv.writer: возвращает записанную строку. """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset):
+    """ Список покупок в формате CSV с заголовком. """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(['name', 'amount', 'measurement_unit']).encode(
+        'utf-8')
+    for row in _rows(queryset):
+        yield writer.writerow(row).encode('utf-8')
+
+
+def iter_json(queryset):
+    """ Список покупок в виде JSON-массива объектов. """
+    separator = '[\n'
+    for name, amount, unit in _rows(queryset):
+        item = json.dumps({'name': name, 'amount': amount,
+                           'measurement_unit': unit}, ensure_ascii=False)
+        yield f'{separator}{item}'.encode('utf-8')
+        separator = ',\n'
+    yield b'[]\n' if separator == '[\n' else b'\n]\n'
+
+
+EXPORTERS = {
+    'txt': iter_text,
+    'csv': iter_csv,
+    'json': iter_json,
+}
@@ -0,0 +1,181 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TransactionTestCase
+from psycopg2 import OperationalError
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE,
+                                 TRANSACTION_STATUS_INTRANS,
+                                 TRANSACTION_STATUS_UNKNOWN)
+
+from core.db_pool import ConnectionPool
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise OperationalError('server closed the connection')
+        self.connection.queries.append(sql)
+
+
+class FakeConnection:
+    """ Соединение psycopg2 в объёме, который использует пул. """
+
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.info = SimpleNamespace(transaction_status=TRANSACTION_STATUS_IDLE)
+        self.queries = []
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """ Выдача, возврат и проверка соединений пула. """
+
+    def make_pool(self, **options):
+        return ConnectionPool(**{
+            'size': 2, 'timeout': 1, 'max_age': 600, 'check_idle': 10,
+            **options})
+
+    def test_checkin_rolls_back_open_transaction(self):
+        pool = self.make_pool()
+        first = pool.checkout(FakeConnection)
+        first.info.transaction_status = TRANSACTION_STATUS_INTRANS
+        pool.checkin(first)
+        self.assertEqual(first.rollbacks, 1)
+        self.assertIs(pool.checkout(FakeConnection), first)
+        self.assertEqual(pool.stats()['reused'], 1)
+
+    def test_checkin_discards_connection_in_unknown_state(self):
+        pool = self.make_pool()
+        first = pool.checkout(FakeConnection)
+        first.info.transaction_status = TRANSACTION_STATUS_UNKNOWN
+        pool.checkin(first)
+        self.assertTrue(first.closed)
+        self.assertIsNot(pool.checkout(FakeConnection), first)
+
+    def test_discarded_connection_frees_its_place(self):
+        # Так DatabaseWrapper закрывает соединение внутри atomic.
+        pool = self.make_pool(size=1, timeout=0)
+        first = pool.checkout(FakeConnection)
+        pool.discard(first)
+        self.assertTrue(first.closed)
+        second = pool.checkout(FakeConnection)
+        self.assertIsNot(second, first)
+        pool.checkin(first)
+        self.assertEqual(pool.stats()['idle'], 0)
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+    def test_full_pool_waits_until_timeout(self):
+        pool = self.make_pool(size=1, timeout=0.1)
+        pool.checkout(FakeConnection)
+        started = time.monotonic()
+        with self.assertRaises(OperationalError):
+            pool.checkout(FakeConnection)
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        stats = pool.stats()
+        self.assertEqual((stats['waits'], stats['timeouts']), (1, 1))
+
+    def test_waiting_checkout_gets_returned_connection(self):
+        pool = self.make_pool(size=1, timeout=5)
+        first = pool.checkout(FakeConnection)
+        timer = threading.Timer(0.05, pool.checkin, [first])
+        timer.start()
+        self.addCleanup(timer.join)
+        self.assertIs(pool.checkout(FakeConnection), first)
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_reset_after_fork(self):
+        pool = self.make_pool()
+        first = pool.checkout(FakeConnection)
+        pool.checkin(first)
+        with mock.patch('core.db_pool.os.getpid', return_value=-1):
+            second = pool.checkout(FakeConnection)
+        self.assertIsNot(second, first)
+        # Соединение родителя не закрывается в потомке.
+        self.assertFalse(first.closed)
+        self.assertEqual(pool.stats()['connections'], 1)
+        self.assertEqual(pool.stats()['opened'], 1)
+
+    def test_expired_connection_is_not_reused(self):
+        pool = self.make_pool(max_age=0)
+        first = pool.checkout(FakeConnection)
+        pool.checkin(first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['connections'], 0)
+
+    def test_idle_connection_is_checked(self):
+        pool = self.make_pool(check_idle=0)
+        first = pool.checkout(FakeConnection)
+        pool.checkin(first)
+        self.assertIs(pool.checkout(FakeConnection), first)
+        self.assertEqual(first.queries, ['SELECT 1'])
+
+    def test_recently_used_connection_is_not_checked(self):
+        pool = self.make_pool(check_idle=60)
+        first = pool.checkout(FakeConnection)
+        pool.checkin(first)
+        self.assertIs(pool.checkout(FakeConnection), first)
+        self.assertEqual(first.queries, [])
+
+    def test_broken_idle_connection_is_replaced(self):
+        pool = self.make_pool(check_idle=0)
+        first = pool.checkout(FakeConnection)
+        pool.checkin(first)
+        first.broken = True
+        second = pool.checkout(FakeConnection)
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        stats = pool.stats()
+        self.assertEqual((stats['connections'], stats['discarded']), (1, 1))
+
+
+class PooledDatabaseWrapperTests(TransactionTestCase):
+    """ Бэкенд core.db_backends.postgresql с настоящей базой. """
+
+    def setUp(self):
+        connection.close()
+
+    def test_closed_connection_is_reused(self):
+        connection.ensure_connection()
+        raw = connection.connection
+        connection.close()
+        self.assertFalse(raw.closed)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertIs(connection.connection, raw)
+
+    def test_connection_closed_in_atomic_block_is_discarded(self):
+        connection.ensure_connection()
+        pool = connection.get_pool()
+        discarded = pool.stats()['discarded']
+        with transaction.atomic():
+            raw = connection.connection
+            connection.close()
+        self.assertTrue(raw.closed)
+        self.assertEqual(pool.stats()['discarded'], discarded + 1)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertIsNot(connection.connection, raw)
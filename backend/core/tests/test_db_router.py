@@ -0,0 +1,107 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.db_router import (STICKY_COOKIE, ReplicaRoutingMiddleware, primary,
+                            use_replicas)
+from recipes.models import Recipe
+
+REPLICAS = ['replica_1', 'replica_2', 'replica_3']
+TOKEN = 'Token 0123456789abcdef'
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS, REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    """ Выбор базы для чтения роутером и ReplicaRoutingMiddleware. """
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(self.read_alias)
+        self.status = 200
+
+    def read_alias(self, request):
+        response = HttpResponse(status=self.status)
+        response.aliases = {router.db_for_read(Recipe) for _ in range(20)}
+        return response
+
+    def test_one_replica_per_block(self):
+        with use_replicas(True):
+            aliases = {router.db_for_read(Recipe) for _ in range(20)}
+            with primary():
+                self.assertEqual(router.db_for_read(Recipe), 'default')
+            with use_replicas(True):
+                aliases.add(router.db_for_read(Recipe))
+        self.assertEqual(len(aliases), 1)
+        self.assertIn(aliases.pop(), REPLICAS)
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+
+    def test_safe_request_reads_from_replica(self):
+        response = self.middleware(self.factory.get('/api/recipes/'))
+        self.assertEqual(len(response.aliases), 1)
+        self.assertTrue(response.aliases <= set(REPLICAS))
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_write_makes_client_read_from_primary(self):
+        response = self.middleware(self.factory.post('/api/recipes/'))
+        self.assertEqual(response.aliases, {'default'})
+        cookie = response.cookies[STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+        request = self.factory.get('/api/recipes/')
+        request.COOKIES[STICKY_COOKIE] = cookie.value
+        self.assertEqual(self.middleware(request).aliases, {'default'})
+
+    def test_expired_or_forged_cookie_is_ignored(self):
+        cookie = self.middleware(
+            self.factory.post('/api/recipes/')).cookies[STICKY_COOKIE].value
+        request = self.factory.get('/api/recipes/')
+        request.COOKIES[STICKY_COOKIE] = cookie
+        with mock.patch('django.core.signing.time.time',
+                        return_value=2 ** 40):
+            self.assertNotEqual(self.middleware(request).aliases,
+                                {'default'})
+        request.COOKIES[STICKY_COOKIE] = '1'
+        self.assertNotEqual(self.middleware(request).aliases, {'default'})
+
+    def test_failed_write_does_not_stick(self):
+        self.status = 400
+        response = self.middleware(self.factory.post(
+            '/api/recipes/', HTTP_AUTHORIZATION=TOKEN))
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        self.status = 200
+        response = self.middleware(self.factory.get(
+            '/api/recipes/', HTTP_AUTHORIZATION=TOKEN))
+        self.assertTrue(response.aliases <= set(REPLICAS))
+
+    def test_token_client_without_cookie_reads_from_primary(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        }}
+        with override_settings(CACHES=shared):
+            self.middleware(self.factory.post(
+                '/api/recipes/', HTTP_AUTHORIZATION=TOKEN))
+            response = self.middleware(self.factory.get(
+                '/api/recipes/', HTTP_AUTHORIZATION=TOKEN))
+            self.assertEqual(response.aliases, {'default'})
+            response = self.middleware(self.factory.get(
+                '/api/recipes/', HTTP_AUTHORIZATION=TOKEN + '0'))
+            self.assertTrue(response.aliases <= set(REPLICAS))
+
+    def test_token_is_not_marked_in_process_local_cache(self):
+        self.middleware(self.factory.post(
+            '/api/recipes/', HTTP_AUTHORIZATION=TOKEN))
+        response = self.middleware(self.factory.get(
+            '/api/recipes/', HTTP_AUTHORIZATION=TOKEN))
+        self.assertTrue(response.aliases <= set(REPLICAS))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_disabled_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaRoutingMiddleware(self.read_alias)
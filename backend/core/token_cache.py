@@ -0,0 +1,100 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .response_cache import CacheGenerations, is_shared_cache
+
+
+class TokenCache:
+    """
+    LRU-кэш соответствия токена пользователю в памяти процесса.
+    Запись живёт не дольше AUTH_TOKEN_CACHE_TTL секунд, записей
+    не больше AUTH_TOKEN_CACHE_SIZE. Вместе с пользователем
+    хранится номер поколения токена из кэша Django: выход,
+    смена пароля или блокировка увеличивают номер, и запись
+    устаревает во всех процессах, а в текущем процессе удаляется
+    сразу. С кэшем Django в памяти процесса сброс не дошёл бы
+    до других процессов, поэтому кэш токенов выключается.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.generations = CacheGenerations('auth-token')
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    @property
+    def enabled(self):
+        return is_shared_cache(self.generations.cache)
+
+    @staticmethod
+    def _generation_name(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def generation(self, key):
+        """ Читается до запроса токена из базы. """
+        return self.generations.get([self._generation_name(key)])[0]
+
+    def get(self, key):
+        """
+        Копия закэшированного пользователя или None. Копия нужна,
+        чтобы изменения request.user не попадали в кэш.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            user, generation, expires_at = entry
+            if (time.monotonic() < expires_at
+                    and generation == self.generation(key)):
+                with self._lock:
+                    self.hits += 1
+                return copy.copy(user)
+            with self._lock:
+                self.stale += 1
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, user, generation):
+        entry = (copy.copy(user), generation,
+                 time.monotonic() + settings.AUTH_TOKEN_CACHE_TTL)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """ Сбрасывает токены во всех процессах. """
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        self.generations.invalidate(*map(self._generation_name, keys))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_size': settings.AUTH_TOKEN_CACHE_SIZE,
+                'ttl': settings.AUTH_TOKEN_CACHE_TTL,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'hit_rate': round(
+                    self.hits / lookups, 4) if lookups else None,
+            }
+
+
+token_cache = TokenCache()
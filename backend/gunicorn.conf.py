@@ -0,0 +1,12 @@
+import os
+
+# Потоки процесса обслуживают другие запросы, пока один из них
+# ждёт документ из пула построения PDF (core.pdf_pool).
+# Без общего кэша (REDIS_URL) по умолчанию один процесс: поколения
+# кэша ответов живут в памяти процесса.
+bind = '0.0.0.0:8000'
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS',
+                        2 if os.getenv('REDIS_URL') else 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
@@ -8,6 +8,8 @@ class RecipeAdmin(admin.ModelAdmin):
         'id',
         'name',
         'author',
+        'favorites_count',
+        'in_carts_count',
     ]
     search_fields = ['name', 'author__username']
     list_filter = ['tags']
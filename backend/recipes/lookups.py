@@ -0,0 +1,24 @@
+from django.contrib.postgres.lookups import PostgresOperatorLookup
+from django.db.models import CharField, FloatField, Func, Value
+
+
+@CharField.register_lookup
+class TrigramWordSimilar(PostgresOperatorLookup):
+    """
+    Lookup field__trigram_word_similar=value - оператор pg_trgm %>.
+    Находит строки, содержащие слово, похожее на value,
+    и обслуживается GIN-индексом с gin_trgm_ops.
+    """
+    lookup_name = 'trigram_word_similar'
+    postgres_operator = '%%>'
+
+
+class TrigramWordSimilarity(Func):
+    """ Функция pg_trgm word_similarity(string, expression). """
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+    def __init__(self, string, expression, **extra):
+        if not hasattr(string, 'resolve_expression'):
+            string = Value(string)
+        super().__init__(string, expression, **extra)
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.20 on 2026-10-18 02:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0004_recipe_ordering'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'позиция списка покупок',
+                'verbose_name_plural': 'список покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='user_shopping_list_ingredient_unique'),
+        ),
+        migrations.RunSQL(
+            sql='''
+                INSERT INTO recipes_shoppinglistitem
+                    (user_id, ingredient_id, amount)
+                SELECT cart.user_id, ri.ingredient_id, SUM(ri.amount)
+                FROM recipes_shoppingcart cart
+                JOIN recipes_recipeingredient ri
+                    ON ri.recipe_id = cart.recipe_id
+                GROUP BY cart.user_id, ri.ingredient_id
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
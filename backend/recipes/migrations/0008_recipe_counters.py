@@ -0,0 +1,48 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_image_derivatives'),
+        ('users', '0002_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_popularity_idx'),
+        ),
+        migrations.RunSQL(
+            sql='''
+                UPDATE recipes_recipe recipe SET
+                    favorites_count = (
+                        SELECT COUNT(*) FROM recipes_favorite favorite
+                        WHERE favorite.recipe_id = recipe.id),
+                    in_carts_count = (
+                        SELECT COUNT(*) FROM recipes_shoppingcart cart
+                        WHERE cart.recipe_id = recipe.id)
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='''
+                UPDATE users_customuser author SET recipes_count = (
+                    SELECT COUNT(*) FROM recipes_recipe recipe
+                    WHERE recipe.author_id = author.id)
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
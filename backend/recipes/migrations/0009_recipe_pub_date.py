@@ -0,0 +1,46 @@
+# Generated by Django 3.2.20 on 2026-10-18 03:11
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ['-pub_date', '-id'], 'verbose_name': 'Рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='pub_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата публикации'),
+        ),
+        # Рецепт опубликован не позже своего последнего изменения
+        # и не позже любого более нового рецепта.
+        migrations.RunSQL(
+            sql='''
+                UPDATE recipes_recipe recipe
+                SET pub_date = published.pub_date
+                FROM (
+                    SELECT id, MIN(updated_at) OVER (ORDER BY id DESC)
+                        AS pub_date
+                    FROM recipes_recipe
+                ) published
+                WHERE published.id = recipe.id
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+    ]
@@ -1,7 +1,14 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import RegexValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, router
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Q, Value, Window, prefetch_related_objects)
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 
-from users.models import CustomUser
+from users.models import CustomUser, Subscription
 
 
 class Tag(models.Model):
@@ -57,6 +64,99 @@ class Ingredient(models.Model):
         ]
 
 
+RECIPE_SEARCH_CONFIG = 'russian'
+RECIPE_SEARCH_VECTOR = (
+    SearchVector('name', weight='A', config=RECIPE_SEARCH_CONFIG)
+    + SearchVector('text', weight='B', config=RECIPE_SEARCH_CONFIG)
+)
+
+
+class RecipeQuerySet(models.QuerySet):
+    """ QuerySet рецептов с данными, необходимыми для их вывода. """
+
+    def with_user_flags(self, user):
+        """
+        Аннотирует рецепты флагами is_favorited/is_in_shopping_cart
+        и подпиской пользователя на автора (is_author_subscribed),
+        подгружает автора. Тэги и ингредиенты догружаются после
+        пагинации через prefetch_details.
+        """
+        if user.is_authenticated:
+            queryset = self.annotate(
+                is_favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk'))),
+                is_author_subscribed=Exists(Subscription.objects.filter(
+                    user=user, author=OuterRef('author_id'))),
+            )
+        else:
+            queryset = self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                is_author_subscribed=Value(
+                    False, output_field=BooleanField()),
+            )
+        return queryset.select_related('author')
+
+    @staticmethod
+    def prefetch_details(recipes):
+        """
+        Подгружает тэги и ингредиенты уже полученных рецептов,
+        чтобы страница рецептов стоила фиксированное число запросов.
+        """
+        prefetch_related_objects(
+            recipes,
+            'tags',
+            Prefetch('recipeingredient_set',
+                     queryset=RecipeIngredient.objects.select_related(
+                         'ingredient')),
+        )
+
+    def bump_version(self, **fields):
+        """
+        Отмечает рецепты изменёнными: новая версия и время.
+        fields обновляются тем же запросом.
+        """
+        return self.update(version=F('version') + 1,
+                           updated_at=timezone.now(), **fields)
+
+    def pending_derivatives(self):
+        """ Рецепты, у которых нет производных текущего изображения. """
+        return self.annotate(derivatives_source=KeyTextTransform(
+            'source', 'image_derivatives'
+        )).filter(Q(derivatives_source__isnull=True)
+                  | ~Q(derivatives_source=F('image')))
+
+    def update_search_vector(self):
+        """ Пересчитывает поисковый вектор по названию и описанию. """
+        return self.update(search_vector=RECIPE_SEARCH_VECTOR)
+
+    def latest_for_authors(self, author_ids, limit=None):
+        """
+        Последние рецепты указанных авторов, не более limit на автора.
+        Отбор делается одним запросом с ROW_NUMBER() OVER
+        (PARTITION BY author_id), результат отсортирован по автору.
+        """
+        queryset = self.filter(author_id__in=author_ids).only(
+            'id', 'name', 'image', 'image_derivatives', 'cooking_time',
+            'author', 'pub_date')
+        if limit is None:
+            return queryset.order_by('author_id', '-pub_date', '-id')
+        ranked = queryset.annotate(author_rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('pub_date').desc(), F('id').desc()],
+        )).order_by()
+        sql, params = ranked.query.sql_with_params()
+        return self.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE ranked.author_rank <= %s '
+            f'ORDER BY ranked.author_id, ranked.pub_date DESC, '
+            f'ranked.id DESC',
+            (*params, limit)
+        )
+
+
 class Recipe(models.Model):
     """ Модель для рецептов."""
     name = models.CharField('Название блюда',
@@ -74,6 +174,12 @@ class Recipe(models.Model):
         blank=False,
         null=False,
     )
+    image_derivatives = models.JSONField(
+        'Производные изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     author = models.ForeignKey(
         CustomUser,
         on_delete=models.SET_NULL,
@@ -90,10 +196,54 @@ class Recipe(models.Model):
         Ingredient,
         through='RecipeIngredient',
     )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В корзинах',
+        default=0,
+        editable=False,
+    )
+    pub_date = models.DateTimeField(
+        'Дата публикации',
+        default=timezone.now,
+    )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=1,
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
+        ordering = ['-pub_date', '-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            GinIndex(fields=['search_vector'],
+                     name='recipe_search_vector_idx'),
+            GinIndex(fields=['name'],
+                     name='recipe_name_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+            models.Index(fields=['-favorites_count', '-id'],
+                         name='recipe_popularity_idx'),
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='recipe_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -197,3 +347,151 @@ class ShoppingCart(models.Model):
         ]
         verbose_name = 'корзина для покупок'
         verbose_name_plural = 'корзины для покупок'
+
+
+class ShoppingListItemManager(models.Manager):
+    """
+    Поддержка агрегата списка покупок в согласованном состоянии.
+    Запросы используют INSERT ... ON CONFLICT (PostgreSQL).
+    """
+
+    def _cursor(self):
+        return connections[router.db_for_write(self.model)].cursor()
+
+    def _tables(self):
+        return {
+            'item': self.model._meta.db_table,
+            'cart': ShoppingCart._meta.db_table,
+            'recipe_ingredient': RecipeIngredient._meta.db_table,
+        }
+
+    def apply_recipe(self, recipe_id, sign, user_id=None):
+        """
+        Прибавляет (sign=1) или вычитает (sign=-1) ингредиенты рецепта
+        в списках покупок пользователей, у которых рецепт в корзине.
+        Если user_id передан - только в списке этого пользователя.
+        """
+        tables = self._tables()
+        params = [sign, recipe_id]
+        user_filter = ''
+        if user_id is not None:
+            user_filter = 'AND cart.user_id = %s'
+            params.append(user_id)
+        with self._cursor() as cursor:
+            cursor.execute(
+                f'''
+                INSERT INTO {tables['item']} (user_id, ingredient_id, amount)
+                SELECT cart.user_id, ri.ingredient_id, ri.amount * %s
+                FROM {tables['cart']} cart
+                JOIN {tables['recipe_ingredient']} ri
+                    ON ri.recipe_id = cart.recipe_id
+                WHERE cart.recipe_id = %s {user_filter}
+                ON CONFLICT (user_id, ingredient_id) DO UPDATE
+                SET amount = {tables['item']}.amount + EXCLUDED.amount
+                ''',
+                params
+            )
+        if sign < 0:
+            stale = self.filter(amount__lte=0)
+            if user_id is not None:
+                stale = stale.filter(user_id=user_id)
+            else:
+                stale = stale.filter(user__shopping_cart__recipe_id=recipe_id)
+            stale.delete()
+
+    def apply_ingredient_deltas(self, recipe_id, deltas):
+        """
+        Меняет количества ингредиентов в списках покупок пользователей,
+        у которых рецепт в корзине: deltas - {ingredient_id: разница}.
+        """
+        if not deltas:
+            return
+        tables = self._tables()
+        with self._cursor() as cursor:
+            cursor.execute(
+                f'''
+                INSERT INTO {tables['item']} (user_id, ingredient_id, amount)
+                SELECT cart.user_id, delta.ingredient_id, delta.amount
+                FROM {tables['cart']} cart
+                CROSS JOIN unnest(%s::bigint[], %s::integer[])
+                    AS delta (ingredient_id, amount)
+                WHERE cart.recipe_id = %s
+                ON CONFLICT (user_id, ingredient_id) DO UPDATE
+                SET amount = {tables['item']}.amount + EXCLUDED.amount
+                ''',
+                [list(deltas), list(deltas.values()), recipe_id]
+            )
+        if any(delta < 0 for delta in deltas.values()):
+            self.filter(
+                amount__lte=0,
+                ingredient_id__in=deltas,
+                user__shopping_cart__recipe_id=recipe_id
+            ).delete()
+
+    def _expected_sql(self):
+        tables = self._tables()
+        return f'''
+            SELECT cart.user_id, ri.ingredient_id, SUM(ri.amount)
+            FROM {tables['cart']} cart
+            JOIN {tables['recipe_ingredient']} ri
+                ON ri.recipe_id = cart.recipe_id
+            GROUP BY cart.user_id, ri.ingredient_id
+        '''
+
+    def rebuild(self):
+        """ Пересобирает агрегат целиком по корзинам покупок. """
+        table = self.model._meta.db_table
+        with self._cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, ingredient_id, amount) '
+                f'{self._expected_sql()}'
+            )
+            return cursor.rowcount
+
+    def count_drift(self):
+        """ Число строк агрегата, расходящихся с корзинами покупок. """
+        table = self.model._meta.db_table
+        actual = f'SELECT user_id, ingredient_id, amount FROM {table}'
+        with self._cursor() as cursor:
+            cursor.execute(
+                f'''
+                SELECT COUNT(*) FROM (
+                    ({self._expected_sql()} EXCEPT {actual})
+                    UNION ALL
+                    ({actual} EXCEPT {self._expected_sql()})
+                ) drift
+                '''
+            )
+            return cursor.fetchone()[0]
+
+
+class ShoppingListItem(models.Model):
+    """
+    Денормализованный список покупок: суммарное количество
+    ингредиента по всем рецептам в корзине пользователя.
+    """
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    amount = models.IntegerField('Количество')
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='user_shopping_list_ingredient_unique'
+            )
+        ]
+        verbose_name = 'позиция списка покупок'
+        verbose_name_plural = 'список покупок'
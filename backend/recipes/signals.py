@@ -0,0 +1,154 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.counters import change_counter
+from core.ingredient_index import ingredient_index
+from core.reference_cache import ingredients_cache, tags_cache
+from core.response_cache import recipes_response_cache
+from users.models import CustomUser
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     RecipeTag, ShoppingCart, ShoppingListItem, Tag)
+
+COUNTER_FIELDS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+# Поля пользователя, которые выводятся в рецептах как автор.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    """ Сброс индекса и кэша ответов при изменении ингредиентов. """
+    ingredient_index.invalidate()
+    ingredients_cache.invalidate()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags_cache(**kwargs):
+    """ Сброс кэша ответов при изменении тэгов. """
+    tags_cache.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(instance, created, **kwargs):
+    """
+    Обновление поискового вектора после сохранения рецепта
+    и версии рецепта, если он изменён.
+    """
+    recipes = Recipe.objects.filter(pk=instance.pk)
+    recipes.update_search_vector()
+    if not created:
+        recipes.bump_version()
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    """ Добавление ингредиентов рецепта в список покупок. """
+    if created:
+        ShoppingListItem.objects.apply_recipe(
+            instance.recipe_id, 1, user_id=instance.user_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    """ Вычитание ингредиентов рецепта из списка покупок. """
+    ShoppingListItem.objects.apply_recipe(
+        instance.recipe_id, -1, user_id=instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def count_author_recipe(instance, created, **kwargs):
+    """ Учёт нового рецепта в счётчике рецептов автора. """
+    if created and instance.author_id is not None:
+        change_counter(CustomUser, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_author_recipe(instance, **kwargs):
+    """ Учёт удалённого рецепта в счётчике рецептов автора. """
+    if instance.author_id is not None:
+        change_counter(CustomUser, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def count_recipe_user(sender, instance, created, **kwargs):
+    """ Учёт добавления рецепта в избранное или корзину. """
+    if created:
+        change_counter(Recipe, instance.recipe_id, COUNTER_FIELDS[sender], 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def uncount_recipe_user(sender, instance, **kwargs):
+    """ Учёт удаления рецепта из избранного или корзины. """
+    change_counter(Recipe, instance.recipe_id, COUNTER_FIELDS[sender], -1)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=RecipeTag)
+@receiver(post_delete, sender=RecipeTag)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_recipes_responses(**kwargs):
+    """ Новое поколение кэша ответов с рецептами. """
+    recipes_response_cache.invalidate('recipes')
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_author_responses(update_fields=None, **kwargs):
+    """
+    Новое поколение кэша ответов с рецептами при изменении
+    пользователя, кроме сохранений без полей автора (last_login).
+    """
+    if update_fields is None or AUTHOR_FIELDS & set(update_fields):
+        recipes_response_cache.invalidate('recipes')
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_popularity_responses(**kwargs):
+    """
+    Новое поколение ответов с сортировкой по популярности,
+    которую меняют избранное и корзины.
+    """
+    recipes_response_cache.invalidate('popularity')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def bump_tag_recipes(instance, created=False, **kwargs):
+    """
+    Тэг выводится в рецептах, поэтому его изменение или удаление
+    меняет версии рецептов с этим тэгом (и их ETag).
+    """
+    if not created:
+        Recipe.objects.filter(tags=instance).bump_version()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def bump_ingredient_recipes(instance, created=False, **kwargs):
+    """ Новые версии рецептов с изменённым ингредиентом. """
+    if not created:
+        Recipe.objects.filter(ingredients=instance).bump_version()
+
+
+@receiver(post_save, sender=CustomUser)
+def bump_author_recipes(instance, created, update_fields=None, **kwargs):
+    """ Новые версии рецептов автора при изменении его данных. """
+    if created:
+        return
+    if update_fields is None or AUTHOR_FIELDS & set(update_fields):
+        Recipe.objects.filter(author=instance).bump_version()
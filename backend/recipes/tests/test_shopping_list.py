@@ -0,0 +1,148 @@
+import io
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem, Tag)
+from users.models import CustomUser
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_file():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name='recipe.png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, ALLOWED_HOSTS=['testserver'])
+class ShoppingListTests(TestCase):
+    """
+    Список покупок (ShoppingListItem) поддерживается запросами
+    INSERT ... ON CONFLICT и после любых изменений корзин и рецептов
+    должен совпадать с суммой ингредиентов рецептов в корзине.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            password='password', first_name='Имя', last_name='Фамилия')
+        self.user = CustomUser.objects.create_user(
+            username='user', email='user@example.com',
+            password='password', first_name='Имя', last_name='Фамилия')
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast',
+                                      color='#E26C2D')
+        self.salt, self.sugar, self.flour = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'сахар', 'мука'))
+        # Идентификатор за пределами int4: ключи - BigAutoField.
+        self.water = Ingredient.objects.create(
+            id=2 ** 31 + 7, name='вода', measurement_unit='мл')
+        self.pancakes = self.create_recipe(
+            'Блины', {self.salt: 5, self.flour: 200})
+        self.porridge = self.create_recipe(
+            'Каша', {self.salt: 3, self.sugar: 20})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, name, ingredients):
+        recipe = Recipe.objects.create(
+            name=name, text='Описание', cooking_time=10,
+            author=self.author, image=image_file())
+        recipe.tags.add(self.tag)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=amount)
+            for ingredient, amount in ingredients.items())
+        return recipe
+
+    def shopping_list(self, user=None):
+        return dict(ShoppingListItem.objects.filter(
+            user=user or self.user
+        ).values_list('ingredient_id', 'amount'))
+
+    def add_to_cart(self, recipe):
+        response = self.client.post(
+            f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 201)
+
+    def update_ingredients(self, recipe, ingredients):
+        author = APIClient()
+        author.force_authenticate(self.author)
+        response = author.patch(
+            f'/api/recipes/{recipe.id}/',
+            {'ingredients': [{'id': ingredient.id, 'amount': amount}
+                             for ingredient, amount in ingredients.items()]},
+            format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def assertNoDrift(self):
+        self.assertEqual(ShoppingListItem.objects.count_drift(), 0)
+
+    def test_add_to_cart_sums_ingredients(self):
+        self.add_to_cart(self.pancakes)
+        self.add_to_cart(self.porridge)
+        self.assertEqual(self.shopping_list(), {
+            self.salt.id: 8, self.flour.id: 200, self.sugar.id: 20})
+        self.assertNoDrift()
+
+    def test_remove_from_cart(self):
+        self.add_to_cart(self.pancakes)
+        self.add_to_cart(self.porridge)
+        response = self.client.delete(
+            f'/api/recipes/{self.pancakes.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.shopping_list(), {
+            self.salt.id: 3, self.sugar.id: 20})
+        self.assertNoDrift()
+
+    def test_amount_change_add_and_remove_ingredients(self):
+        self.add_to_cart(self.pancakes)
+        self.add_to_cart(self.porridge)
+        other = CustomUser.objects.create_user(
+            username='other', email='other@example.com', password='password')
+        ShoppingCart.objects.create(user=other, recipe=self.pancakes)
+
+        self.update_ingredients(
+            self.pancakes, {self.salt: 7, self.water: 500})
+
+        self.assertEqual(self.shopping_list(), {
+            self.salt.id: 10, self.sugar.id: 20, self.water.id: 500})
+        self.assertEqual(self.shopping_list(other), {
+            self.salt.id: 7, self.water.id: 500})
+        self.assertNoDrift()
+
+    def test_cart_delete(self):
+        self.add_to_cart(self.pancakes)
+        ShoppingCart.objects.filter(user=self.user).delete()
+        self.assertEqual(self.shopping_list(), {})
+        self.assertNoDrift()
+
+    def test_recipe_delete(self):
+        self.add_to_cart(self.pancakes)
+        self.add_to_cart(self.porridge)
+        self.pancakes.delete()
+        self.assertEqual(self.shopping_list(), {
+            self.salt.id: 3, self.sugar.id: 20})
+        self.assertNoDrift()
+
+    def test_count_drift_and_rebuild(self):
+        self.add_to_cart(self.pancakes)
+        ShoppingListItem.objects.filter(ingredient=self.salt).update(amount=1)
+        ShoppingListItem.objects.filter(ingredient=self.flour).delete()
+        self.assertEqual(ShoppingListItem.objects.count_drift(), 3)
+
+        ShoppingListItem.objects.rebuild()
+        self.assertEqual(self.shopping_list(), {
+            self.salt.id: 5, self.flour.id: 200})
+        self.assertNoDrift()
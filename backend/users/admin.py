@@ -9,6 +9,7 @@ class UserAdmin(admin.ModelAdmin):
         'email',
         'first_name',
         'last_name',
+        'recipes_count',
     ]
     search_fields = ['username', ]
     empty_value_display = '-пусто-'
@@ -32,6 +32,11 @@ class CustomUser(AbstractUser):
         null=False,
         max_length=150,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('id',)
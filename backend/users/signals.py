@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.token_cache import token_cache
+from .models import CustomUser
+
+# Сохранения только этих полей не сбрасывают кэш токенов.
+UNTRACKED_FIELDS = {'last_login'}
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    """ Выход (удаление токена) сбрасывает его в кэше токенов. """
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_tokens(instance, update_fields=None, **kwargs):
+    """
+    Смена пароля, блокировка и другие изменения пользователя
+    сбрасывают его токены в кэше, чтобы request.user был актуальным.
+    """
+    if update_fields is not None and set(update_fields) <= UNTRACKED_FIELDS:
+        return
+    keys = Token.objects.filter(
+        user_id=instance.pk).values_list('key', flat=True)
+    token_cache.invalidate(*keys)